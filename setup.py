@@ -29,12 +29,16 @@ REQUIRED = [
     "scipy",
     "pandas",
     "numpy",
+    "aiohttp",
+    "requests",
 ]
 
 # What packages are optional?
 EXTRAS = {
     "misc": ["pandasql"],
-    "layered": ["aiohttp"]
+    "layered": ["aiohttp"],
+    "compression": ["lz4", "zstandard"],
+    "shared": ["redis"]
 }
 
 # The rest you shouldn't have to touch too much :)
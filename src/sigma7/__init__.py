@@ -1,8 +1,11 @@
 from time import time
+from collections import OrderedDict
 
 CACHE = {
     "iex": {},
     "sigma7": {},
+    "entries": OrderedDict(),
+    "expiry": [],
     "last": time(),
     "size": 0
-}
\ No newline at end of file
+}
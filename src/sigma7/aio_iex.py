@@ -0,0 +1,286 @@
+""" aio_iex - asyncio IEX client and async versions of the peer fan-out functions
+
+compareStat, calcSharpe, compare_performance and compare_ceo_comp each make one or more
+IEX calls per peer. The async versions here issue those calls concurrently (at most
+iex_concurrency at a time per event loop, see sessions), so a cold call costs about one
+round trip instead of one per peer. The functions in iex_funcs keep their signatures
+and run these through run_sync. Data comes from the current provider (see providers).
+
+Per-symbol data (peers, stats, charts, dividends) goes through prefetch, which reads
+what it can from the cache and gets the rest from IEX's /stock/market/batch endpoint,
+up to iex_batch_size symbols and several data types per request. Each (symbol, type)
+is cached separately, so overlapping peer groups share entries. Charts are kept in
+the price store (see price_store) rather than per range, and peers through the peer
+graph (see peer_graph).
+"""
+
+import asyncio
+from contextvars import copy_context
+from statistics import mean
+import pandas as pd
+from pyEX import PyEXception
+from sigma7.settings import iex_batch_size
+from sigma7.sessions import get_loop
+from sigma7.providers import fetch_async
+from sigma7.dec_cache import cache, market_close, lookup_cache, append_cache
+from sigma7.peer_graph import lookup_peers, store_peers, peer_universe
+from sigma7.price_store import lookup_history, store_history, update_history, slice_history, plan_fetch
+from sigma7.utils import to_chart_df, to_dividends_df, freeze, format_comp, sort_dict, _remove, peer_comparisons, sharpe_stats, total_return
+
+def run_sync(func, *args, **kwargs):
+    """Runs an async function to completion from synchronous code.
+
+    The coroutine runs on sigma7's long-lived event loop (see sessions.get_loop), so
+    calls share one aiohttp session and its open connections. Context variables
+    (e.g. the throttle priority) are carried over from the caller.
+
+    Args:
+        func (function): Coroutine function to run
+        *args, **kwargs: Arguments for func
+
+    Returns:
+        object: Output of func
+    """
+    ctx = copy_context()
+    async def main():
+        for var, value in ctx.items(): var.set(value)
+        return await func(*args, **kwargs)
+    loop = get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop: raise RuntimeError("run_sync cannot block sigma7's own event loop - await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(main(), loop).result()
+
+async def iex_get(path: str, **params) -> object:
+    """GETs an IEX endpoint from the current data provider and returns the parsed JSON.
+
+    Args:
+        path (str): Path after the API version, e.g. "stock/MSFT/peers"
+        **params: Query parameters
+
+    Returns:
+        object: Parsed JSON response
+
+    Raises:
+        PyEXception: on a non 200 response, like pyEX
+    """
+    return await fetch_async(path, **params)
+
+# batch types whose data depends on the range parameter
+RANGED = ["chart", "dividends"]
+
+# cache ttl per batch type - None uses cache_time_limit
+BATCH_TTL = {
+    "stats": market_close(),
+    "dividends": market_close()
+}
+
+def batch_entry(symbol: str, _type: str, _range: str = None) -> tuple:
+    """Returns the cache entry (platform, key, func) a batch type for a symbol is stored in."""
+    if _type in RANGED: return ("iex", symbol, f"batch_{_type}_{_range}")
+    return ("iex", symbol, f"batch_{_type}")
+
+async def batch_async(symbols: list, types: list, _range: str = None) -> dict:
+    """Calls the IEX batch endpoint for up to iex_batch_size symbols.
+
+    Args:
+        symbols (list): Symbols to request
+        types (list): Data types to request for every symbol [peers, stats, chart, dividends, ...]
+        _range (str): Range for chart/dividends
+
+    Returns:
+        dict: Symbol -> type -> data
+    """
+    params = {"symbols": ",".join(symbols), "types": ",".join(types)}
+    if _range: params["range"] = _range
+    return await iex_get("stock/market/batch", **params)
+
+async def prefetch(symbols: list, types: list, _range: str = None) -> dict:
+    """Returns several data types for several symbols, fetching only what is not cached.
+
+    Missing (symbol, type) pairs are grouped by the types they need and split into
+    batch requests of at most iex_batch_size symbols, which run concurrently. Every
+    result is cached per symbol and type. Charts are read from and written to the
+    price store, as date-indexed DataFrames, and requested in batches of their own
+    for the range plan_fetch picks (a short top-up range for stale histories). Peers
+    are read from and written to the peer graph.
+
+    Args:
+        symbols (list): Symbols to return data for
+        types (list): Data types to return [peers, stats, chart, dividends, ...]
+        _range (str): Range for chart/dividends
+
+    Returns:
+        dict: Symbol -> type -> data (types IEX returned nothing for are left out)
+    """
+    out = {symbol: {} for symbol in symbols}
+    missing = {}
+    bases = {}
+    for symbol in out.keys():
+        for _type in types:
+            if _type == "chart":
+                data = lookup_history(symbol, _range)
+                if data is None:
+                    __range, bases[symbol] = plan_fetch(symbol, _range)
+                    missing.setdefault((symbol, __range), []).append(_type)
+                else: out[symbol][_type] = data
+                continue
+            if _type == "peers":
+                data = lookup_peers(symbol)
+                if data is None: missing.setdefault((symbol, _range), []).append(_type)
+                else: out[symbol][_type] = data
+                continue
+            data, meta = lookup_cache(*batch_entry(symbol, _type, _range))
+            if meta is None: missing.setdefault((symbol, _range), []).append(_type)
+            else: out[symbol][_type] = data
+    groups = {}
+    for (symbol, __range), _types in missing.items():
+        groups.setdefault((tuple(_types), __range), []).append(symbol)
+    calls = []
+    for (_types, __range), _symbols in groups.items():
+        for i in range(0, len(_symbols), iex_batch_size):
+            calls.append((_types, __range, _symbols[i:i + iex_batch_size]))
+    results = await asyncio.gather(*[batch_async(_symbols, _types, __range) for _types, __range, _symbols in calls])
+    for (_types, __range, _symbols), result in zip(calls, results):
+        for symbol in _symbols:
+            data = result.get(symbol) or result.get(symbol.upper()) or {}
+            for _type in _types:
+                if _type not in data: continue
+                if _type == "chart":
+                    bars = to_chart_df(data[_type])
+                    if bases[symbol] is None: history = store_history(symbol, __range, bars)
+                    else: history = update_history(symbol, bases[symbol], bars)
+                    out[symbol][_type] = slice_history(history, _range)
+                    continue
+                if _type == "peers":
+                    out[symbol][_type] = store_peers(symbol, data[_type])
+                    continue
+                val = freeze(data[_type])
+                append_cache(*batch_entry(symbol, _type, _range), val, BATCH_TTL.get(_type), f"batch_{_type}")
+                out[symbol][_type] = val
+    return out
+
+async def prefetch_peer_groups(symbols: list, types: list, _range: str = None) -> dict:
+    """prefetch for several symbols and all their peers, fetching each distinct symbol once.
+
+    The peers of every symbol are fetched in one batch, then types for the union of
+    the symbols and their peers (see peer_universe) in another, so a peer shared by
+    many symbols is only requested once.
+
+    Args:
+        symbols (list): Symbols whose peer groups to fetch
+        types (list): Data types to return [stats, chart, dividends, ...]
+        _range (str): Range for chart/dividends
+
+    Returns:
+        dict: Symbol -> type -> data, for the symbols and every peer
+    """
+    await prefetch(symbols, ["peers"])
+    return await prefetch(peer_universe(symbols), types, _range)
+
+async def fetch_type(symbol: str, _type: str, _range: str = None) -> object:
+    """Returns one data type for one symbol through prefetch."""
+    out = await prefetch([symbol], [_type], _range)
+    if _type not in out[symbol]:
+        raise PyEXception(f"No {_type} data for {symbol}")
+    return out[symbol][_type]
+
+async def peers_async(symbol: str) -> list:
+    return list(await fetch_type(symbol, "peers"))
+
+async def key_stats_async(symbol: str, stat: str = "") -> object:
+    stats = await fetch_type(symbol, "stats")
+    return stats[stat] if stat else stats
+
+async def chart_df_async(symbol: str, timeframe: str = "1m") -> pd.DataFrame:
+    """Async price_history - daily bars indexed by date, sorted ascending."""
+    return await fetch_type(symbol, "chart", timeframe)
+
+async def dividends_df_async(symbol: str, timeframe: str = "ytd") -> pd.DataFrame:
+    """Async dividendsBasicDF - dividends indexed by ex date."""
+    return to_dividends_df(await fetch_type(symbol, "dividends", timeframe))
+
+async def ceo_comp_async(symbol: str) -> dict:
+    return await iex_get(f"stock/{symbol}/ceo-compensation")
+
+async def sharpe_ratio_async(symbol: str, N: int, rf: float = 0) -> dict:
+    prices = await chart_df_async(symbol, timeframe=f"{N}y")
+    return sharpe_stats(prices, rf)
+
+@cache(platform = "iex", ttl = market_close())
+async def full_returns_async(symbol: str, frame: str = "ytd") -> dict:
+    """Async full_returns - fetches prices and dividends concurrently."""
+    prices, divs = await asyncio.gather(chart_df_async(symbol, frame), dividends_df_async(symbol, frame))
+    return total_return(symbol, frame, prices, divs)
+
+async def compare_stats_async(symbol: str, stats: list) -> dict:
+    """Async compare_stats - fetches the keyStats of the symbol and every peer in one batch."""
+    peersOf = await peers_async(symbol)
+    data = await prefetch([symbol, *peersOf], ["stats"])
+    peer_stats = {peer: data[peer].get("stats", {}) for peer in peersOf}
+    return peer_comparisons(symbol, data[symbol]["stats"], peer_stats, stats)
+
+async def compareStat_async(symbol: str, stat: str) -> dict:
+    """Async compareStat - a single stat of compare_stats_async."""
+    return (await compare_stats_async(symbol, [stat]))[stat]
+
+async def calcSharpe_async(symbol: str, frame: int = 2, rf: float = .0) -> dict:
+    """Async calcSharpe - fetches the charts of the symbol, SPY, and every peer in one batch."""
+    peersOf = _remove("SPY", list(await peers_async(symbol)))
+    await prefetch([symbol, "SPY", *peersOf], ["chart"], f"{frame}y")
+    sharpes = await asyncio.gather(*[sharpe_ratio_async(_symbol, frame, rf) for _symbol in [symbol, "SPY", *peersOf]])
+    out = {
+        symbol: sharpes[0],
+        "S&P 500": sharpes[1]
+    }
+    out["peers"] = dict(zip(peersOf, sharpes[2:]))
+    return out
+
+async def compare_performance_async(symbol: str, frame: str = "ytd") -> dict:
+    """Async compare_performance - fetches the prices and dividends of the symbol and every peer in one batch."""
+    _peers = await peers_async(symbol)
+    await prefetch([symbol, *_peers], ["chart", "dividends"], frame)
+    sout = await full_returns_async(symbol, frame)
+    out = {
+        "symbol": symbol,
+        "frame": frame
+    }
+    if not _peers:
+        out["returns"] = ["No peers to compare"]
+        return out
+    pouts = await asyncio.gather(*[full_returns_async(peer, frame) for peer in _peers])
+    returns = {peer: pout["percent_return"] for peer, pout in zip(_peers, pouts)}
+    __peers = list(returns.values())
+    returns[symbol] = sout["percent_return"]
+    returns = dict(sorted(returns.items(), key=lambda x: x[1], reverse=True))
+    out["returns"] = returns
+    out["average"] = sout["percent_return"]
+    out["peerAvg"] = mean(__peers)
+    return out
+
+async def compare_ceo_comp_async(symbol: str) -> dict:
+    """Async compare_ceo_comp - fetches the compensation of the symbol and every peer concurrently.
+
+    Peers without compensation data are skipped.
+    """
+    _peers = await peers_async(symbol)
+    raws = await asyncio.gather(ceo_comp_async(symbol), *[ceo_comp_async(peer) for peer in _peers], return_exceptions=True)
+    _symbol = raws[0]
+    if isinstance(_symbol, BaseException): raise _symbol
+    out = format_comp(_symbol)
+    out["comp"] = sort_dict(out["comp"])
+    peer_comp = dict()
+    peer_avg = list()
+    for _peer, raw in zip(_peers, raws[1:]):
+        if isinstance(raw, PyEXception): continue
+        if isinstance(raw, BaseException): raise raw
+        peer_comp[_peer] = raw["total"]
+        peer_avg.append(raw["total"])
+    peer_avg.append(_symbol["total"])
+    peer_comp[symbol] = _symbol["total"]
+    out["peerAvg"] = round(mean(peer_avg),2)
+    peer_comp = sort_dict(peer_comp)
+    out["peers"] = peer_comp
+    return out
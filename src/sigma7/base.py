@@ -5,13 +5,10 @@ The functions contained in this module typically are smaller in output, less for
 in other functions later. They are defined here to later allow for asynchronicity. 
 """
 
-from json import loads
-from .settings import econ_keys, econ_ep
+from .settings import econ_keys
 from .utils import econ_df
-from pyEX import chart
-from os import environ
 from .decor import dec_test
-from requests import get
+from .providers import fetch
 
 def econ_series(_key: str, range: str = "1y", format: str="dict") -> dict:
     """Returns a dict or dataframe of econ data from IEX. 
@@ -31,9 +28,6 @@ def econ_series(_key: str, range: str = "1y", format: str="dict") -> dict:
     if _key not in econ_keys.keys():
         raise Exception("_key Param not supported..")
     key = econ_keys[_key]
-    token = environ["IEX_TOKEN"]
-    url = econ_ep.format(key, token, range)
-    load = get(url)
-    out = loads(load.text)
+    out = fetch(f"time-series/economic/{key}", range=range)
     if format == "df": out = econ_df(out)
     return out
@@ -0,0 +1,145 @@
+""" codec - compact encodings for large sigma7 cache entries
+
+Lists of records (e.g. political trades) are turned into columns, which pickle far
+smaller than thousands of individual dicts, and the pickled bytes are compressed with
+lz4 or zstandard when available (zlib otherwise). DataFrames are pickled as-is, which
+already stores their column arrays contiguously. Encoded values carry CODEC_VERSION,
+so values written by an incompatible version (e.g. in a persistent tier) are rejected
+by decode instead of unpickled.
+"""
+
+import pickle
+import zlib
+from logging import warning
+from .settings import cache_compression
+from .utils import freeze
+
+try:
+    import lz4.frame as lz4
+except ImportError:
+    lz4 = None
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+COMPRESSORS = {
+    "zlib": (lambda raw: zlib.compress(raw, 1), zlib.decompress),
+    "none": (lambda raw: raw, lambda raw: raw)
+}
+if lz4: COMPRESSORS["lz4"] = (lz4.compress, lz4.decompress)
+if zstd: COMPRESSORS["zstd"] = (lambda raw: zstd.ZstdCompressor(level=3).compress(raw), lambda raw: zstd.ZstdDecompressor().decompress(raw))
+
+_MISSING = "__sigma7_missing__"
+CODEC_VERSION = 1 # bump when encoded values can no longer be decoded by older/newer code (e.g. a class changes)
+
+class CodecError(ValueError):
+    """Raised when an encoded value cannot be decoded."""
+
+class Encoded:
+    """An encoded cache value - compressed bytes, the name of the compressor used and the codec version."""
+    __slots__ = ("data", "compression", "version")
+
+    def __init__(self, data: bytes, compression: str, version: int = CODEC_VERSION):
+        self.data = data
+        self.compression = compression
+        self.version = version
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + len(self.data)
+
+class Columns:
+    """A list of records stored as one list per field."""
+    __slots__ = ("fields", "columns", "length")
+
+    def __init__(self, fields: list, columns: list, length: int):
+        self.fields = fields
+        self.columns = columns
+        self.length = length
+
+    def __reduce__(self):
+        return (Columns, (self.fields, self.columns, self.length))
+
+def pick_compression(name: str = None) -> str:
+    """Resolves a compression setting to an available compressor.
+
+    Args:
+        name (str): [auto, lz4, zstd, zlib, none] - defaults to cache_compression
+
+    Returns:
+        str: Name of the compressor to use
+    """
+    if name is None: name = cache_compression
+    if not name: return "none"
+    if name == "auto":
+        for _name in ["lz4", "zstd", "zlib"]:
+            if _name in COMPRESSORS: return _name
+    if name not in COMPRESSORS:
+        warning(f"Compression {name} not available, falling back to zlib")
+        return "zlib"
+    return name
+
+def to_columns(o: object) -> object:
+    """Recursively turns lists of dicts into Columns."""
+    if isinstance(o, dict):
+        return {_key: to_columns(val) for _key, val in o.items()}
+    if isinstance(o, (list, tuple)) and len(o) > 1 and all(isinstance(val, dict) for val in o):
+        fields = list()
+        for record in o:
+            for field in record.keys():
+                if field not in fields: fields.append(field)
+        columns = [[to_columns(record.get(field, _MISSING)) for record in o] for field in fields]
+        return Columns(fields, columns, len(o))
+    if isinstance(o, (list, tuple)):
+        return type(o)(to_columns(val) for val in o)
+    return o
+
+def from_columns(o: object) -> object:
+    """Reverses to_columns."""
+    if isinstance(o, Columns):
+        records = [dict() for _ in range(o.length)]
+        for field, column in zip(o.fields, o.columns):
+            for record, val in zip(records, column):
+                if isinstance(val, str) and val == _MISSING: continue
+                record[field] = from_columns(val)
+        return records
+    if isinstance(o, dict):
+        return {_key: from_columns(val) for _key, val in o.items()}
+    if isinstance(o, (list, tuple)):
+        return type(o)(from_columns(val) for val in o)
+    return o
+
+def encode(o: object, compression: str = None) -> Encoded:
+    """Encodes an object into compressed, columnar bytes.
+
+    Args:
+        o (object): Object to encode
+        compression (str): Compressor to use - defaults to cache_compression
+
+    Returns:
+        Encoded: The encoded object
+    """
+    compression = pick_compression(compression)
+    raw = pickle.dumps(to_columns(o), protocol=pickle.HIGHEST_PROTOCOL)
+    return Encoded(COMPRESSORS[compression][0](raw), compression)
+
+def decode(encoded: Encoded) -> object:
+    """Decodes an Encoded object back into a frozen python object.
+
+    Args:
+        encoded (Encoded): Output of encode
+
+    Returns:
+        object: The original object, frozen
+
+    Raises:
+        CodecError: If the value was encoded by another codec version, or is corrupt
+    """
+    if encoded.version != CODEC_VERSION:
+        raise CodecError(f"Encoded with codec version {encoded.version}, expected {CODEC_VERSION}")
+    try:
+        raw = COMPRESSORS[encoded.compression][1](encoded.data)
+        return freeze(from_columns(pickle.loads(raw)))
+    except Exception as e:
+        raise CodecError(f"Cannot decode value: {e}") from e
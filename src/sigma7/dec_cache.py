@@ -2,16 +2,152 @@
 Cache module for sigma7
 
 This module contains the code for the sigma7 cache. 
+
+Entries live in CACHE[platform][key][func]. CACHE["entries"] keeps every entry in
+least-recently-used order alongside its deep size in bytes, so CACHE["size"] is
+always current and the coldest entries are evicted to stay under cache_limit.
+Cached values are frozen (see utils.freeze) and their metadata is kept in
+CACHE["entries"] rather than in the payload, so one copy can be shared by every
+caller. Entries over cache_encode_threshold bytes are stored compressed (see codec)
+and decoded when read, unless their function is in cache_keep_decoded. Entries are written through to any persistent TIERS (e.g. the
+SQLite DiskCache at cache_disk_path, or the RedisCache shared by every worker when
+cache_backend is set) and memory misses are served from them. CACHE["expiry"] is a
+min-heap of (expires, platform, key, func) so expired entries are found without
+walking (or copying) the whole cache. STATS counts hits, misses, evictions,
+expirations, and bytes held per platform and function.
+
+Locking: each (platform, key) bucket is guarded by one of cache_lock_stripes
+STRIPES, and LRU_LOCK guards the bookkeeping (CACHE["entries"], CACHE["size"],
+CACHE["expiry"]). A stripe is always taken before LRU_LOCK and no two stripes are
+held at once. Reads only take their bucket's stripe and skip the LRU touch if
+LRU_LOCK is busy, so they never queue behind a global lock.
 """
 
-from .settings import cache_limit, cache_time_limit
+from .settings import cache_limit, cache_lock_stripes, cache_encode_threshold, cache_keep_decoded, cache_disk_path, cache_backend, cache_backend_url, cache_time_limit, cache_sweeper, cache_sweep_interval, market_tz, cache_latency_buckets, cache_stats_interval
 from sigma7 import CACHE
-from sigma7.utils import log, pull_key, stringify_args, scan_cache
+from sigma7.utils import log, pull_key, stringify_args, bind_args, deep_getsizeof, freeze
+from sigma7.codec import encode, decode, CodecError
+from sigma7.disk_cache import DiskCache
+from sigma7.shared_cache import RedisCache, LocalRedis
+from sigma7.throttle import background
 from logging import warning
 import functools
-from copy import deepcopy
-from sys import getsizeof
-from time import time
+from inspect import signature, iscoroutinefunction
+from heapq import heappush, heappop, heapify
+from threading import Thread, Event, Lock, RLock
+from concurrent.futures import Future
+from time import time, perf_counter
+from bisect import bisect_left
+from json import dumps
+from secrets import token_bytes
+import asyncio
+import pandas as pd
+
+STRIPES = [RLock() for _ in range(cache_lock_stripes)]
+LRU_LOCK = Lock()
+
+SWEEPER = {
+    "thread": None,
+    "stop": None
+}
+
+STATS_DUMP = {
+    "thread": None,
+    "stop": None
+}
+
+# (platform, function name) -> counters, see _stat
+STATS = {}
+STATS_LOCK = Lock()
+
+# persistent tiers behind the in-memory cache, see add_tier
+TIERS = []
+
+# (platform, key, func) -> Future of the call currently computing that entry
+INFLIGHT = {}
+INFLIGHT_LOCK = Lock()
+# (event loop, platform, key, func) -> Task of the coroutine currently computing that entry
+AIO_INFLIGHT = {}
+
+def _stat(platform: str, name: str) -> dict:
+    _key = (platform, name)
+    if _key not in STATS:
+        STATS[_key] = {
+            "hits": 0, "stale_hits": 0, "tier_hits": 0, "misses": 0, "evictions": 0, "expirations": 0,
+            "entries": 0, "bytes": 0,
+            "latency": [0] * (len(cache_latency_buckets) + 1), "latency_sum": 0.0
+        }
+    return STATS[_key]
+
+def record_stat(platform: str, name: str, field: str, n: int = 1):
+    """Adds n to a cache counter for a given platform and function.
+
+    Args:
+        platform (str): Platform the entry lives on [iex, sigma7]
+        name (str): Name of the cached function
+        field (str): Counter to increment [hits, stale_hits, tier_hits, misses, evictions, expirations, entries, bytes]
+        n (int): Amount to add - defaults to 1
+    """
+    with STATS_LOCK:
+        _stat(platform, name)[field] += n
+
+def record_latency(platform: str, name: str, seconds: float):
+    """Records how long a cache miss took to compute in the latency histogram.
+
+    Args:
+        platform (str): Platform the entry lives on [iex, sigma7]
+        name (str): Name of the cached function
+        seconds (float): Time taken to compute the entry
+    """
+    with STATS_LOCK:
+        stat = _stat(platform, name)
+        stat["latency"][bisect_left(cache_latency_buckets, seconds)] += 1
+        stat["latency_sum"] += seconds
+
+def cache_stats() -> dict:
+    """Returns a snapshot of the cache counters.
+
+    Counters are returned per function ("platform.function") and summed per platform.
+    Latency histograms count misses by how long they took to compute, with bucket 
+    upper bounds (in seconds) under "latency_buckets" - the last bucket is unbounded.
+
+    Returns:
+        dict: Snapshot of cache statistics
+    """
+    with STATS_LOCK:
+        functions = {f"{platform}.{name}": dict(stat, latency=list(stat["latency"])) for (platform, name), stat in STATS.items()}
+    platforms = {}
+    for _key, stat in functions.items():
+        platform = _key.split(".")[0]
+        if platform not in platforms:
+            platforms[platform] = dict(stat, latency=list(stat["latency"]))
+            continue
+        total = platforms[platform]
+        for field, val in stat.items():
+            if field == "latency":
+                total[field] = [x + y for x, y in zip(total[field], val)]
+            else: total[field] += val
+    return {
+        "size": CACHE["size"],
+        "limit": cache_limit,
+        "entries": len(CACHE["entries"]),
+        "latency_buckets": list(cache_latency_buckets),
+        "platforms": platforms,
+        "functions": functions
+    }
+
+def reset_stats() -> bool:
+    """Zeroes the hit/miss/latency counters. Entry and byte counts are kept.
+
+    Returns:
+        bool: Whether the operation was successful
+    """
+    with STATS_LOCK:
+        for stat in STATS.values():
+            for field in ["hits", "stale_hits", "tier_hits", "misses", "evictions", "expirations", "latency_sum"]:
+                stat[field] = 0
+            stat["latency"] = [0] * len(stat["latency"])
+    return True
 
 def check_cache_size() -> bool:
     """Ensures that the cache size less than the designated limit.
@@ -23,11 +159,43 @@ def check_cache_size() -> bool:
     _size = CACHE["size"]
     return _size < cache_limit
 
+def lookup_cache(platform: str, key: str, func: str) -> tuple:
+    """Looks up an entry and its metadata in the sigma7 cache.
+
+    Entries past their expiry are removed and reported as missing. A hit marks 
+    the entry as most recently used. Memory misses fall through to TIERS.
+
+    Args:
+        platform (str): Which platform to search the cache for - top layer of cache [iex, sigma7]
+        key (str): Usually a stock ticker/econ ticker - second most layer of cache
+        func (str): Name of function for cache, lowest layer of cache
+
+    Returns:
+        tuple: (data, meta) - (False, None) if there is no valid entry
+    """
+    entry = (platform, key, func)
+    with _stripe(platform, key):
+        # entries are only replaced or removed under their stripe, so meta and data match
+        meta = CACHE["entries"].get(entry)
+        if meta is not None:
+            if meta["expires"] <= time():
+                if _pop(entry, meta): record_stat(platform, meta["name"], "expirations")
+                return False, None
+            data = CACHE[platform][key][func]
+    if meta is None: return lookup_tiers(platform, key, func)
+    if LRU_LOCK.acquire(blocking=False):
+        try:
+            if CACHE["entries"].get(entry) is meta: CACHE["entries"].move_to_end(entry)
+        finally:
+            LRU_LOCK.release()
+    if meta["encoded"]: data = decode(data)
+    return data, meta
+
 def check_cache(platform: str, key: str, func: str):
     """Checks the cache for a given symbol and function.
 
     This function indexes the cache to determine if there is data available.
-    If not, the function returns False.
+    If not, the function returns False. A hit marks the entry as most recently used.
 
     Args:
         platform (str): Which platform to search the cache for - top layer of cache [iex, sigma7]
@@ -35,70 +203,242 @@ def check_cache(platform: str, key: str, func: str):
         func (str): Name of function for cache, lowest layer of cache
 
     """
-    if key in CACHE[platform].keys():
-        if func in CACHE[platform][key].keys():
-            return CACHE[platform][key][func]
-    return False
-             
+    return lookup_cache(platform, key, func)[0]
+
+def _stripe(platform: str, key: str) -> RLock:
+    return STRIPES[hash((platform, key)) % len(STRIPES)]
+
+def evict_cache(limit: int = None) -> int:
+    """Evicts least recently used entries until the cache fits within a limit.
+
+    Args:
+        limit (int): Size in bytes the cache should fit in - defaults to cache_limit
+
+    Returns:
+        int: Number of entries evicted
+    """
+    if limit is None: limit = cache_limit
+    evicted = 0
+    while True:
+        with LRU_LOCK:
+            if CACHE["size"] <= limit or not CACHE["entries"]: break
+            entry, meta = next(iter(CACHE["entries"].items()))
+        if _pop(entry, meta):
+            record_stat(entry[0], meta["name"], "evictions")
+            evicted += 1
+    return evicted
         
-def append_cache(platform: str, key: str, func: str, _dict: dict) -> bool:
+def append_cache(platform: str, key: str, func: str, _dict: dict, ttl = None, name: str = None) -> bool:
     """Appends an object to the sigma7 cache 
 
+    The object is frozen before it is stored, so callers must not modify it afterwards.
+    Objects of at least cache_encode_threshold bytes are stored encoded, unless name is in cache_keep_decoded.
+    The deep size of the object is added to CACHE["size"], and the least
+    recently used entries are evicted if the cache would grow past cache_limit.
+
     Args:
         platform (str): Which platform to search the cache for - top layer of cache [iex, sigma7]
         key (str): Usually a stock ticker/econ ticker - second most layer of cache
         func (str): Name of function for cache, lowest layer of cache
         _dict (dict): data to append into platform -> key -> func -> data
+        ttl (float | function): Seconds until the entry expires, or a policy (see expires_at) - defaults to cache_time_limit
+        name (str): Name of the function the entry belongs to, for cache_stats - defaults to func
 
     Returns:
         bool: Whether the operation was successful
     """
-    _dict["cache_ts"] = time()
-    if key in CACHE[platform].keys():    
-        CACHE[platform][key].update({func: _dict})
-    else:
-        CACHE[platform][key] = {
-            func: _dict
-        }
+    ts = time()
+    if name is None: name = func
+    meta = {"ts": ts, "expires": entry_expiry(ts, ttl), "name": name}
+    _dict = freeze(_dict)
+    data = _insert(platform, key, func, _dict, meta)
+    if data is None: return False
+    if TIERS:
+        payload = data if meta["encoded"] else encode(_dict)
+        for tier in TIERS:
+            tier.set(platform, key, func, payload, meta)
     return True
 
-def pop_cache(platform: str, key: str, func: str) -> bool:
-    """Deletes a specific entry in the sigma7 cache.
+def _insert(platform: str, key: str, func: str, _dict: object, meta: dict) -> object:
+    _size = deep_getsizeof(_dict)
+    encoded = bool(cache_encode_threshold) and _size >= cache_encode_threshold and meta["name"] not in cache_keep_decoded
+    if encoded:
+        _dict = encode(_dict)
+        _size = _dict.__sizeof__()
+    if _size > cache_limit:
+        warning("Cannot cache {} - {} bytes is over the cache limit".format(func, _size))
+        return None
+    meta.update({"size": _size, "encoded": encoded})
+    entry = (platform, key, func)
+    evict_cache(cache_limit - _size)
+    with _stripe(platform, key):
+        with LRU_LOCK:
+            _remove(entry)
+            if key in CACHE[platform].keys():    
+                CACHE[platform][key].update({func: _dict})
+            else:
+                CACHE[platform][key] = {
+                    func: _dict
+                }
+            CACHE["entries"][entry] = meta
+            CACHE["size"] += _size
+            heappush(CACHE["expiry"], (meta["expires"], platform, key, func))
+    with STATS_LOCK:
+        stat = _stat(platform, meta["name"])
+        stat["entries"] += 1
+        stat["bytes"] += _size
+    return _dict
+
+def lookup_tiers(platform: str, key: str, func: str) -> tuple:
+    """Looks up an entry in the persistent tiers (TIERS), promoting hits into memory.
+
+    Entries that cannot be decoded (corrupt, or written by another codec version) are
+    deleted from their tier and treated as misses.
 
     Args:
         platform (str): Which platform to search the cache for - top layer of cache [iex, sigma7]
         key (str): Usually a stock ticker/econ ticker - second most layer of cache
         func (str): Name of function for cache, lowest layer of cache
-    
+
+    Returns:
+        tuple: (data, meta) - (False, None) if no tier has a valid entry
+    """
+    for tier in TIERS:
+        encoded, meta = tier.get(platform, key, func)
+        if encoded is None: continue
+        try:
+            data = decode(encoded)
+        except CodecError as e:
+            warning("Dropping unreadable {} - {} - {} from {}: {}".format(platform, key, func, type(tier).__name__, e))
+            tier.delete(platform, key, func)
+            continue
+        _insert(platform, key, func, data, meta)
+        record_stat(platform, meta["name"], "tier_hits")
+        return data, meta
+    return False, None
+
+def add_tier(tier) -> bool:
+    """Adds a persistent tier (e.g. DiskCache) behind the in-memory cache.
+
+    Tiers are written through on append_cache and checked, in order, on memory misses.
+
+    Args:
+        tier (object): Object with get, set, delete, purge, and clear methods like DiskCache
+
     Returns:
         bool: Whether the operation was successful
     """
-    del CACHE[platform][key][func]
+    TIERS.append(tier)
     return True
+
+def entry_expiry(ts: float, ttl = None) -> float:
+    """Returns when an entry cached at ts expires under a ttl or policy.
+
+    Args:
+        ts (float): Time the entry was cached
+        ttl (float | function): Seconds to keep the entry, or a policy taking ts and returning the expiry
+
+    Returns:
+        float: Expiry as a unix timestamp
+    """
+    if ttl is None: ttl = cache_time_limit
+    if callable(ttl): return ttl(ts)
+    return ts + ttl
+
+def _next_time(ts: float, hour: int, minute: int, tz: str, weekdays: bool) -> float:
+    now = pd.Timestamp(ts, unit="s", tz="UTC").tz_convert(tz)
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0, nanosecond=0)
+    wall = target.tz_localize(None)
+    while target <= now or (weekdays and target.weekday() >= 5):
+        wall += pd.Timedelta(days=1)
+        target = wall.tz_localize(tz, ambiguous=False, nonexistent="shift_forward")
+    return target.timestamp()
+
+def expires_at(hour: int, minute: int = 0, tz: str = market_tz, weekdays: bool = False):
+    """Freshness policy - entries expire at the next occurrence of a wall-clock time.
+
+    Args:
+        hour (int): Hour of the day (24h) to expire at
+        minute (int): Minute of the hour to expire at
+        tz (str): Time zone of the wall clock - defaults to market_tz
+        weekdays (bool): Only expire on weekdays - defaults to False
+
+    Returns:
+        function: Policy to pass as ttl to cache/append_cache
+    """
+    return lambda ts: _next_time(ts, hour, minute, tz, weekdays)
+
+def market_close():
+    """Freshness policy - entries expire at the next market close (16:00 New York, weekdays).
+
+    Returns:
+        function: Policy to pass as ttl to cache/append_cache
+    """
+    return expires_at(16, 0, market_tz, weekdays = True)
+
+def _remove(entry: tuple) -> dict:
+    # caller holds the entry's stripe and LRU_LOCK
+    meta = CACHE["entries"].pop(entry, None)
+    if meta is None: return None
+    platform, key, func = entry
+    CACHE["size"] -= meta["size"]
+    del CACHE[platform][key][func]
+    with STATS_LOCK:
+        stat = _stat(platform, meta["name"])
+        stat["entries"] -= 1
+        stat["bytes"] -= meta["size"]
+    return meta
+
+def _pop(entry: tuple, meta: dict = None) -> bool:
+    platform, key, func = entry
+    with _stripe(platform, key):
+        with LRU_LOCK:
+            if meta is not None and CACHE["entries"].get(entry) is not meta: return False
+            return _remove(entry) is not None
+
+def pop_cache(platform: str, key: str, func: str) -> bool:
+    """Deletes a specific entry in the sigma7 cache and its persistent tiers.
+
+    Args:
+        platform (str): Which platform to search the cache for - top layer of cache [iex, sigma7]
+        key (str): Usually a stock ticker/econ ticker - second most layer of cache
+        func (str): Name of function for cache, lowest layer of cache
+    
+    Returns:
+        bool: Whether the entry was in memory
+    """
+    popped = _pop((platform, key, func))
+    for tier in TIERS:
+        tier.delete(platform, key, func)
+    return popped
     
 def purge_cache(verbose = False) -> bool:
     """Purge expired entries in the sigma7 cache
 
+    Pops entries off the expiry heap until the soonest expiry is in the future.
+    Heap items left behind by replaced or evicted entries are skipped.
+
     Returns:
         bool: Whether the operation was successful
     """
-    _cache = deepcopy(CACHE)
-    for item in _cache.items():
-        platform, _out = item
-        if not isinstance(_out, dict): continue
-        if verbose: log(platform)
-        for _item in _out.items():
-            symbol, __out = _item
-            if verbose: log(symbol)
-            for __item in __out.items():
-                func, _data = __item
-                if verbose: log(func)
-                ts = _data["cache_ts"]
-                diff = time() - ts
-                if cache_time_limit <= diff:
-                    if verbose: log("removing..")
-                    del CACHE[platform][symbol][func]
-                    CACHE["last"] = time()
+    now = time()
+    while True:
+        with LRU_LOCK:
+            heap = CACHE["expiry"]
+            if not heap or heap[0][0] > now: break
+            expires, platform, symbol, func = heappop(heap)
+            meta = CACHE["entries"].get((platform, symbol, func))
+        if not meta or meta["expires"] != expires: continue
+        if not _pop((platform, symbol, func), meta): continue
+        if verbose: log(f"Removing {platform} - {symbol} - {func}")
+        record_stat(platform, meta["name"], "expirations")
+        CACHE["last"] = now
+    with LRU_LOCK:
+        if len(CACHE["expiry"]) > 2 * len(CACHE["entries"]) + 64:
+            CACHE["expiry"] = [(meta["expires"], *entry) for entry, meta in CACHE["entries"].items()]
+            heapify(CACHE["expiry"])
+    for tier in TIERS:
+        tier.purge()
     return True
 
 def clean_cache(verbose = False) -> bool:
@@ -107,22 +447,227 @@ def clean_cache(verbose = False) -> bool:
     Returns: 
         bool: Whether the operation was successful
     """
-    _cache = deepcopy(CACHE)
-    _size = scan_cache(_cache)["size"]
-    for item in _cache.items():
-        if item not in ["iex", "sigma7"]: continue
-        platform, out = item
+    for platform in ["iex", "sigma7"]:
         if verbose: log(platform)
-        for _item in out.items():
-            symbol, _out = _item
-            if verbose: log(symbol)
-            if not _out: 
-                del CACHE[platform][symbol]
-                if verbose: log(f"Cleaning {platform} - {symbol}")
-    CACHE["size"] = _size
+        for symbol in list(CACHE[platform].keys()):
+            with _stripe(platform, symbol):
+                if symbol in CACHE[platform] and not CACHE[platform][symbol]: 
+                    del CACHE[platform][symbol]
+                    if verbose: log(f"Cleaning {platform} - {symbol}")
+    return True
+
+def flush_cache(tiers: bool = True) -> bool:
+    """Removes every entry from the sigma7 cache.
+
+    Args:
+        tiers (bool): Whether to clear the persistent tiers too - defaults to True
+
+    Returns:
+        bool: Whether the operation was successful
+    """
+    for stripe in STRIPES: stripe.acquire()
+    try:
+        with LRU_LOCK:
+            for platform in ["iex", "sigma7"]:
+                CACHE[platform].clear()
+            CACHE["entries"].clear()
+            CACHE["expiry"].clear()
+            CACHE["size"] = 0
+            CACHE["last"] = time()
+    finally:
+        for stripe in STRIPES: stripe.release()
+    with STATS_LOCK:
+        for stat in STATS.values():
+            stat["entries"], stat["bytes"] = 0, 0
+    if tiers:
+        for tier in TIERS:
+            tier.clear()
+    return True
+
+def sweep_cache(verbose = False) -> bool:
+    """Runs one maintenance pass - purges expired entries and cleans empty symbols.
+
+    Returns:
+        bool: Whether the operation was successful
+    """
+    purge_cache(verbose)
+    clean_cache(verbose)
+    return True
+
+def _every(stop: Event, interval: float, job, label: str):
+    while not stop.wait(interval):
+        try:
+            job()
+        except Exception as e:
+            warning("{} failed: {}".format(label, e))
+
+def _start_periodic(handle: dict, job, interval: float, label: str) -> bool:
+    if handle["thread"] and handle["thread"].is_alive(): return False
+    stop = Event()
+    thread = Thread(target=_every, args=(stop, interval, job, label), name=f"sigma7-{label}", daemon=True)
+    handle["thread"], handle["stop"] = thread, stop
+    thread.start()
+    return True
+
+def _stop_periodic(handle: dict) -> bool:
+    thread, stop = handle["thread"], handle["stop"]
+    if not thread: return False
+    stop.set()
+    thread.join()
+    handle["thread"], handle["stop"] = None, None
+    return True
+
+def start_sweeper(interval: float = None) -> bool:
+    """Starts a background thread that sweeps the cache on an interval.
+
+    Args:
+        interval (float): Seconds between sweeps - defaults to cache_sweep_interval
+
+    Returns:
+        bool: Whether a new sweeper was started (False if one is already running)
+    """
+    if interval is None: interval = cache_sweep_interval
+    return _start_periodic(SWEEPER, sweep_cache, interval, "cache-sweeper")
+
+def stop_sweeper() -> bool:
+    """Stops the background sweeper if it is running.
+
+    Returns:
+        bool: Whether a sweeper was stopped
+    """
+    return _stop_periodic(SWEEPER)
+
+def dump_stats() -> bool:
+    """Logs a snapshot of the cache statistics as JSON.
+
+    Returns:
+        bool: Whether the operation was successful
+    """
+    log(dumps(cache_stats()))
+    return True
+
+def start_stats_dump(interval: float = None) -> bool:
+    """Starts a background thread that logs cache_stats on an interval.
+
+    Args:
+        interval (float): Seconds between dumps - defaults to cache_stats_interval
+
+    Returns:
+        bool: Whether a new thread was started (False if one is already running)
+    """
+    if interval is None: interval = cache_stats_interval
+    if not interval: return False
+    return _start_periodic(STATS_DUMP, dump_stats, interval, "cache-stats")
+
+def stop_stats_dump() -> bool:
+    """Stops the background stats dump if it is running.
+
+    Returns:
+        bool: Whether a thread was stopped
+    """
+    return _stop_periodic(STATS_DUMP)
+
+def single_flight(entry: tuple, compute):
+    """Runs compute once per entry, no matter how many threads ask at the same time.
+
+    The first caller for an entry runs compute; callers arriving while it is still
+    running wait for and share its result (or exception).
+
+    Args:
+        entry (tuple): (platform, key, func) the computation fills
+        compute (function): Zero argument function producing the value
+
+    Returns:
+        object: Output of compute
+    """
+    with INFLIGHT_LOCK:
+        flight = INFLIGHT.get(entry)
+        leader = flight is None
+        if leader:
+            flight = Future()
+            INFLIGHT[entry] = flight
+    if not leader: return flight.result()
+    try:
+        out = compute()
+    except BaseException as e:
+        flight.set_exception(e)
+        raise
+    finally:
+        with INFLIGHT_LOCK:
+            INFLIGHT.pop(entry, None)
+    flight.set_result(out)
+    return out
+
+async def single_flight_async(entry: tuple, compute):
+    """asyncio version of single_flight.
+
+    The first caller on an event loop schedules compute as a task; other callers
+    on that loop await the same task. Cancelling one waiter does not cancel the
+    shared task.
+
+    Args:
+        entry (tuple): (platform, key, func) the computation fills
+        compute (function): Zero argument coroutine function producing the value
+
+    Returns:
+        object: Output of compute
+    """
+    loop = asyncio.get_running_loop()
+    _entry = (loop, *entry)
+    task = AIO_INFLIGHT.get(_entry)
+    if task is None:
+        task = loop.create_task(compute())
+        AIO_INFLIGHT[_entry] = task
+        task.add_done_callback(lambda _: AIO_INFLIGHT.pop(_entry, None))
+    return await asyncio.shield(task)
+
+def revalidate(entry: tuple, compute) -> bool:
+    """Recomputes an entry on a background thread unless it is already being computed.
+
+    The refresh's upstream calls run at background priority (see throttle).
+
+    Args:
+        entry (tuple): (platform, key, func) the computation fills
+        compute (function): Zero argument function producing the value
+
+    Returns:
+        bool: Whether a refresh was started
+    """
+    if entry in INFLIGHT: return False
+    def refresh():
+        try:
+            with background():
+                single_flight(entry, compute)
+        except Exception as e:
+            warning("Refreshing {} failed: {}".format(entry, e))
+    Thread(target=refresh, name="sigma7-cache-refresh", daemon=True).start()
+    return True
+
+def revalidate_async(entry: tuple, compute) -> bool:
+    """asyncio version of revalidate - schedules the refresh on the running loop.
+
+    Args:
+        entry (tuple): (platform, key, func) the computation fills
+        compute (function): Zero argument coroutine function producing the value
+
+    Returns:
+        bool: Whether a refresh was started
+    """
+    loop = asyncio.get_running_loop()
+    _entry = (loop, *entry)
+    if _entry in AIO_INFLIGHT: return False
+    async def refresh():
+        try:
+            with background():
+                return await compute()
+        except Exception as e:
+            warning("Refreshing {} failed: {}".format(entry, e))
+    task = loop.create_task(refresh())
+    AIO_INFLIGHT[_entry] = task
+    task.add_done_callback(lambda _: AIO_INFLIGHT.pop(_entry, None))
     return True
 
-def cache(platform, _key = None) -> dict:
+def cache(platform, _key = None, ttl = None, stale_after: float = None) -> dict:
     """Decorator cache function 
 
     This function checks the cache available data on a given
@@ -130,37 +675,95 @@ def cache(platform, _key = None) -> dict:
     returned. If data is not available, the function is run and the data
     is appended into the cache for later use.
 
+    Keys are built from the arguments bound to the function's signature, so
+    positional and keyword spellings of the same call (and calls relying on
+    defaults) share one entry. Non-scalar arguments are hashed into the key.
+    Concurrent misses on the same entry are coalesced, so only one of them
+    runs the function. Coroutine functions are supported. Outputs are frozen
+    (read-only dicts, tuples, read-only arrays) on hits and misses alike.
+
+    Each entry expires according to ttl - a number of seconds (defaults to
+    cache_time_limit) or a freshness policy such as market_close() or expires_at(9).
+    With stale_after set, an entry older than stale_after seconds is still returned
+    immediately, while a background refresh replaces it. Once an entry is past its 
+    expiry callers block on a fresh computation as usual.
+
     Args:
-        func (function): Wraps over a function to enable a cache
-                        This function should have params - platform, key, and func
+        platform (str): Top layer of cache to store entries in [iex, sigma7]
+        _key (str): Fixed key to store entries under - defaults to the symbol/key argument
+        ttl (float | function): Seconds to keep entries, or a freshness policy
+        stale_after (float): Seconds after which an entry is served stale and refreshed
     
     Returns:
         dict: A cached output or newly generated output
     """
     def dec_wrapper(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            params = stringify_args(kwargs)
+        sig = signature(func)
+
+        def entry_of(args, kwargs) -> tuple:
+            bound = bind_args(sig, args, kwargs)
+            params = stringify_args(bound)
             _func = "{}_{}".format(func.__name__, params)
-            key = pull_key(kwargs)
+            key = pull_key(bound)
             if _key: key = _key
-            if key:
-                _cache = check_cache(platform, key, _func)
-                if _cache: return _cache
-            out = func(*args, **kwargs)
-            if check_cache_size() and key:
-                append_cache(platform, key, _func, out)
-            else: warning("Cannot cache {}".format(func.__name__))
-            return out
-        return wrapper
-    return dec_wrapper
-
-        
+            return (platform, key, _func)
 
+        def stale(meta) -> bool:
+            if stale_after is None: return False
+            return time() - meta["ts"] >= stale_after
 
+        name = func.__name__
 
+        def store(entry, out, start):
+            platform, key, _func = entry
+            record_latency(platform, name, perf_counter() - start)
+            out = freeze(out)
+            if key:
+                append_cache(platform, key, _func, out, ttl, name)
+            else: warning("Cannot cache {}".format(name))
+            return out
 
-            
+        def hit(entry, meta) -> bool:
+            if stale(meta):
+                record_stat(entry[0], name, "stale_hits")
+                return True
+            record_stat(entry[0], name, "hits")
+            return False
 
+        if iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                entry = entry_of(args, kwargs)
+                async def compute():
+                    start = perf_counter()
+                    return store(entry, await func(*args, **kwargs), start)
+                if not entry[1]: return await compute()
+                _cache, meta = lookup_cache(*entry)
+                if meta is not None:
+                    if hit(entry, meta): revalidate_async(entry, compute)
+                    return _cache
+                record_stat(platform, name, "misses")
+                return await single_flight_async(entry, compute)
+            return async_wrapper
 
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            entry = entry_of(args, kwargs)
+            def compute():
+                start = perf_counter()
+                return store(entry, func(*args, **kwargs), start)
+            if not entry[1]: return compute()
+            _cache, meta = lookup_cache(*entry)
+            if meta is not None:
+                if hit(entry, meta): revalidate(entry, compute)
+                return _cache
+            record_stat(platform, name, "misses")
+            return single_flight(entry, compute)
+        return wrapper
+    return dec_wrapper
 
+if cache_backend == "redis": add_tier(RedisCache.from_url(cache_backend_url))
+elif cache_backend == "local": add_tier(RedisCache(LocalRedis(), secret = token_bytes(32)))
+if cache_disk_path: add_tier(DiskCache(cache_disk_path))
+if cache_sweeper: start_sweeper()
+if cache_stats_interval: start_stats_dump()
@@ -0,0 +1,94 @@
+""" disk_cache - persistent, on-disk tier of the sigma7 cache
+
+Entries are kept in a local SQLite file in their encoded form (see codec), keyed on the
+same (platform, key, func) as the in-memory cache and carrying the same timestamps,
+expiry and codec version, so a restarted process can serve them instead of going upstream.
+"""
+
+import sqlite3
+from threading import Lock
+from time import time
+from .codec import Encoded
+
+class DiskCache:
+    """SQLite backed cache tier.
+
+    Args:
+        path (str): Location of the SQLite file - created if missing
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "platform TEXT, key TEXT, func TEXT, name TEXT, ts REAL, expires REAL, "
+            "compression TEXT, data BLOB, version INTEGER DEFAULT 0, PRIMARY KEY (platform, key, func))"
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(entries)")]
+        if "version" not in columns: self.conn.execute("ALTER TABLE entries ADD COLUMN version INTEGER DEFAULT 0")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires)")
+
+    def get(self, platform: str, key: str, func: str) -> tuple:
+        """Returns an unexpired entry and its metadata.
+
+        Returns:
+            tuple: (Encoded, meta) - (None, None) if there is no valid entry
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT name, ts, expires, compression, data, version FROM entries WHERE platform=? AND key=? AND func=?",
+                (platform, key, func)
+            ).fetchone()
+        if row is None: return None, None
+        name, ts, expires, compression, data, version = row
+        if expires <= time():
+            self.delete(platform, key, func)
+            return None, None
+        return Encoded(data, compression, version), {"ts": ts, "expires": expires, "name": name}
+
+    def set(self, platform: str, key: str, func: str, encoded: Encoded, meta: dict) -> bool:
+        """Writes an entry, replacing any previous entry with the same key.
+
+        Returns:
+            bool: Whether the operation was successful
+        """
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (platform, key, func, meta["name"], meta["ts"], meta["expires"], encoded.compression, encoded.data, encoded.version)
+            )
+        return True
+
+    def delete(self, platform: str, key: str, func: str) -> bool:
+        """Deletes an entry.
+
+        Returns:
+            bool: Whether an entry was deleted
+        """
+        with self.lock:
+            cur = self.conn.execute("DELETE FROM entries WHERE platform=? AND key=? AND func=?", (platform, key, func))
+        return cur.rowcount > 0
+
+    def purge(self) -> int:
+        """Deletes every expired entry.
+
+        Returns:
+            int: Number of entries deleted
+        """
+        with self.lock:
+            cur = self.conn.execute("DELETE FROM entries WHERE expires <= ?", (time(),))
+        return cur.rowcount
+
+    def clear(self) -> bool:
+        """Deletes every entry.
+
+        Returns:
+            bool: Whether the operation was successful
+        """
+        with self.lock:
+            self.conn.execute("DELETE FROM entries")
+        return True
@@ -3,36 +3,44 @@
 These functions generally transform and assist in wrapping over IEX endpoints.
 """
 
-from os import environ
 from numpy.core.fromnumeric import cumsum
-from sigma7.utils import authenticate_client, format_comp, sharpe_ratio, _remove, top_botN, econ_df, format_comp, gather_insiders, sort_dict, within_date_range
-from sigma7.dec_cache import cache
+from sigma7.utils import authenticate_client, top_botN, econ_df, gather_insiders, within_date_range, to_dividends_df
+from sigma7.aio_iex import run_sync, full_returns_async, compare_stats_async, calcSharpe_async, compare_performance_async, compare_ceo_comp_async
+from sigma7.dec_cache import cache, market_close, expires_at
+from sigma7.price_store import price_history
+from sigma7.providers import fetch
 from sigma7.decor import benchmark
-from sigma7.settings import correlates
-from pyEX.stocks.profiles import peers
-from pyEX.stocks.research import keyStats
-from pyEX.stocks.prices import chart, chartDF, ohlcDF
-from pyEX import dividendsBasicDF, insiderTransactions, ceoCompensation, PyEXception, company
-from scipy.stats import trim_mean
-from math import ceil 
+from sigma7.settings import correlates, peer_stale_after, ceo_comp_ttl, ceo_comp_stale_after, company_ttl, econ_refresh_hour
 from statistics import mean
 from scipy.stats import spearmanr
-from pyEX import news
 from time import ctime, time
 from logging import info, warning
 import pandas as pd
 from numpy import NAN, NaN, prod, cumprod
-from sigma7.settings import correlates, econ_ep, econ_keys, econ_correlates
-from requests import get
-from json import loads
+from sigma7.settings import correlates, econ_keys, econ_correlates
+
+@cache(platform = "iex", stale_after = peer_stale_after)
+def compare_stats(symbol: str, stats: list) -> dict:
+    """Compares several stats of a given stock with its peers
+
+    Fetches the keyStats of the stock and every peer once, and compares each stat
+    as compareStat does.
+
+    Args: 
+        symbol (str): Given IEX symbol to compare
+        stats (list): Supported statistics to compare symbols with (see IEX for supported stats)
+    Returns:
+        dict: Each stat mapped to the compareStat output for it
+    """
+    return run_sync(compare_stats_async, symbol, list(stats))
 
-@cache(platform = "iex")
 def compareStat(symbol: str, stat: str, **args) -> dict:
     """Compares a given stat of a given stock with its peers
 
     This function, given a stock and statistic, will compare said stock and statistic
     to its peers. It will also return the average or adjusted average of its peer group as a
-    baseline.
+    baseline. To compare several stats, use compare_stats. The output is read from
+    compare_stats' cache entry rather than cached again, so it is never staler than it.
 
     Args: 
         symbol (str): Given IEX symbol to compare
@@ -40,35 +48,9 @@ def compareStat(symbol: str, stat: str, **args) -> dict:
     Returns:
         dict: Dictionary containing the symbol's stat, its peer stats, and baseline stats.
     """
-    peersOf = peers(symbol)
-    stats = []
-    peer_data = {}
-    for peer in peersOf:
-        val = round(keyStats(peer, stat), 2)
-        stats.append(val)
-        peer_data[peer] = val
-    trim = ceil(100/len(peersOf))
-    trimmedAvg = trim_mean(stats, trim/100)
-    peerAvg = mean(stats)
-    og_stat = keyStats(symbol, stat)
-    if (trimmedAvg - og_stat) < (peerAvg - og_stat):
-        out_stat = trimmedAvg
-    else:
-        out_stat = peerAvg
-    output = peer_data
-    output[symbol] = og_stat
-    output = dict(sorted(output.items(), key=lambda x: x[1], reverse=True)) 
-    out = {"symbol": symbol, "average": og_stat, "peerAvg": out_stat, 
-            "peers": peersOf, "peer_metrics": peer_data,
-            "output": output,
-             "meta": {
-                 "trimmed_meta": f"Trimmed Mean - {trim}%",
-                 "trimmedAvg": trimmedAvg, "realPeerAvg": peerAvg 
-                }
-        }
-    return out
+    return compare_stats(symbol, [stat])[stat]
 
-@cache(platform = "iex")
+@cache(platform = "iex", ttl = market_close())
 def corAnalysis(symbol: str, correlates: dict, frame: str="1y") -> dict:
     """Correlates a given symbol to given correlates (usually several markets and econometrics) 
 
@@ -84,7 +66,7 @@ def corAnalysis(symbol: str, correlates: dict, frame: str="1y") -> dict:
 
     crs = {}
     all = {}
-    x = chartDF(symbol, timeframe=frame, changeFromClose=True, sort="asc")[["changePercent"]]
+    x = price_history(symbol, frame)[["changePercent"]]
     for cors in correlates.items():
         _key, _val = cors
         _out = dict()
@@ -131,7 +113,7 @@ def analyzeNews(symbol: str) -> dict:
         dict: a dictionary containing news entries
     """
     client = authenticate_client()
-    raw = news(symbol, 10)
+    raw = fetch(f"stock/{symbol}/news/last/10")
     fields = ["headline", "summary", "source", "sentiment", "date", "url", "related"]
     out, docs, loads = list(), list(), list()  
     for article in raw:
@@ -157,7 +139,7 @@ def analyzeNews(symbol: str) -> dict:
         out.append(_out)
     return {"news": out}
 
-@cache(platform = "iex")
+@cache(platform = "iex", stale_after = peer_stale_after)
 def calcSharpe(symbol: str, frame: int=2, rf: float=.0) -> dict:
     """Calculates sharpe ratio for a given stock along with its peers
 
@@ -168,22 +150,9 @@ def calcSharpe(symbol: str, frame: int=2, rf: float=.0) -> dict:
     Returns:
         dict: Dictionary containing sharpe ratio alongside a given symbols peers
     """
-    peersOf = list(peers(symbol))
-    peersOf = _remove("SPY", peersOf)
-    sharpe = sharpe_ratio(symbol, frame, rf)
-    _peers = {}
-    spy = sharpe_ratio("SPY", frame, rf)
-    out = {
-        symbol: sharpe,
-        "S&P 500": spy
-    }
-    for peer in peersOf:
-        _sharpe = sharpe_ratio(peer, frame, rf)
-        _peers[peer] = _sharpe
-    out["peers"] = _peers
-    return out
+    return run_sync(calcSharpe_async, symbol, frame, rf)
 
-@cache(platform = "iex")
+@cache(platform = "iex", ttl = market_close())
 def dividend_yield(symbol: str, frame: str="5y", full: bool=False) -> dict:
     """Calculates dividend yield for a given stock and formats it in an optimal way
 
@@ -199,8 +168,8 @@ def dividend_yield(symbol: str, frame: str="5y", full: bool=False) -> dict:
     """
     if frame not in ["1y", "3y", "5y"]:
         raise Exception("param frame not supported. Please input 1yr, 3yr, or 5yr")
-    prices = chartDF(symbol, timeframe = frame, sort="asc")[["uClose"]]
-    divs = dividendsBasicDF(symbol, timeframe = frame)
+    prices = price_history(symbol, frame)[["uClose"]]
+    divs = to_dividends_df(fetch(f"stock/{symbol}/dividends/{frame}"))
     if len(divs) ==  0:
         out = {
             "symbol": symbol,
@@ -243,12 +212,12 @@ def dividend_yield(symbol: str, frame: str="5y", full: bool=False) -> dict:
         out["raw"] = _out
     return out
 
-@cache(platform = "iex")
 def full_returns(symbol: str, frame: str="ytd") -> dict:
     """ Calculates the total return/full return of a stock
 
     This function calculates total return, and incorporates dividend yield 
-    in the CAGR. 
+    in the CAGR. It runs (and shares the cache entry of) full_returns_async,
+    which reads the per-symbol chart and dividends the batch prefetch fills.
 
     Args:
         symbol (str): Supported IEX symbol
@@ -256,26 +225,9 @@ def full_returns(symbol: str, frame: str="ytd") -> dict:
     Returns:
         dict: Dictionary containing time series data
     """
-    divs = dividendsBasicDF(symbol = symbol, timeframe= frame)
-    prices = chartDF(symbol, timeframe = frame, sort="asc")[["close"]]
-    if divs.empty: 
-        total_div = 0
-    else:
-        divs = divs["amount"].tolist()
-        total_div = sum(divs)
-    start = prices.head(1).squeeze()
-    end = prices.tail(1).squeeze()
-    total_return = (end - start) + total_div
-    per_return = round((total_return/start) * 100, 2) 
-    out = {
-        "symbol": symbol,
-        "frame": frame,
-        "return": round(total_return, 2),
-        "percent_return": per_return
-    }
-    return out
+    return run_sync(full_returns_async, symbol, frame)
 
-@cache(platform = "iex")
+@cache(platform = "iex", stale_after = peer_stale_after)
 def compare_performance(symbol: str, frame:str="ytd") -> dict:
     """Compares total performance of a given symbol and its peers
 
@@ -288,29 +240,9 @@ def compare_performance(symbol: str, frame:str="ytd") -> dict:
     Returns:
         dict: Dictionary containing performance data of a symbol and its peers 
     """
-    _peers = peers(symbol)
-    sout = full_returns(symbol, frame) 
-    out = {
-        "symbol": symbol,
-        "frame": frame
-    }
-    if not _peers:
-        out["returns"] = ["No peers to compare"]
-        return out
-    returns = {}
-    __peers = list()
-    for peer in _peers:
-        pout = full_returns(peer, frame)
-        returns[peer] = pout["percent_return"]
-        __peers.append(pout["percent_return"])     
-    returns[symbol] = sout["percent_return"]
-    returns = dict(sorted(returns.items(), key=lambda x: x[1], reverse=True)) 
-    out["returns"] = returns
-    out["average"] = sout["percent_return"]
-    out["peerAvg"] = mean(__peers)
-    return out
+    return run_sync(compare_performance_async, symbol, frame)
 
-@cache(platform = "iex")
+@cache(platform = "iex", ttl = expires_at(econ_refresh_hour))
 def econ_series(_key: str, range: str = "1y", format: str="dict"):
     """Generates time series data for a given econometric
 
@@ -324,10 +256,7 @@ def econ_series(_key: str, range: str = "1y", format: str="dict"):
     if _key not in econ_keys.keys():
         raise Exception("_key Param not supported..")
     key = econ_keys[_key]
-    token = environ["IEX_TOKEN"]
-    url = econ_ep.format(key, token, range)
-    load = get(url)
-    out = loads(load.text)
+    out = fetch(f"time-series/economic/{key}", range=range)
     if format == "df": out = econ_df(out)
     else: out = dict(out)
     return out
@@ -344,7 +273,7 @@ def gather_correlates(_range: str="1y") -> dict:
     markets = dict()
     for correlate in correlates.items():
         _key, _val = correlate
-        __out = chart(_val, timeframe = _range, sort = "asc")
+        __out = fetch(f"stock/{_val}/chart/{_range}", sort="asc")
         markets[_key] = __out
     out["markets"] = markets
     
@@ -356,7 +285,7 @@ def gather_correlates(_range: str="1y") -> dict:
     out["econ"] = econ
     return out
 
-@cache(platform = "iex")
+@cache(platform = "iex", ttl = ceo_comp_ttl, stale_after = ceo_comp_stale_after)
 def compare_ceo_comp(symbol: str) -> dict:
     """Compares CEO Compensation of a given stock with its peers.
 
@@ -368,27 +297,9 @@ def compare_ceo_comp(symbol: str) -> dict:
     Returns:
         dict: Dictionary containing ceo compensation data
     """
-    _peers = peers(symbol)
-    _symbol = ceoCompensation(symbol)
-    out = format_comp(_symbol)
-    out["comp"] = sort_dict(out["comp"])
-    peer_comp = dict()
-    peer_avg = list()
-    for _peer in _peers:
-        try:
-            raw = ceoCompensation(_peer)
-        except PyEXception:
-            continue
-        peer_comp[_peer] = raw["total"]
-        peer_avg.append(raw["total"])
-    peer_avg.append(_symbol["total"])
-    peer_comp[symbol] = _symbol["total"]
-    out["peerAvg"] = round(mean(peer_avg),2)
-    peer_comp = sort_dict(peer_comp)
-    out["peers"] = peer_comp
-    return out
+    return run_sync(compare_ceo_comp_async, symbol)
 
-@cache(platform = "iex")
+@cache(platform = "iex", ttl = market_close())
 def insider_transactions(symbol: str) -> dict:
     """Formats, orders, and computes insider transactions for a given symbol.
 
@@ -397,7 +308,7 @@ def insider_transactions(symbol: str) -> dict:
     Returns:
         dict: Dictionary containing insider transaction data
     """
-    raw = insiderTransactions(symbol)
+    raw = fetch(f"stock/{symbol}/insider-transactions")
     out = {
         "symbol": symbol,
         "transactions": {}
@@ -420,7 +331,7 @@ def insider_transactions(symbol: str) -> dict:
     out["transactions"] = list(transactions.values())
     return out
 
-@cache(platform = "iex")
+@cache(platform = "iex", ttl = market_close())
 def top_insiders(symbol: str) -> dict:
     """Returns the top insiders by volume
 
@@ -429,7 +340,7 @@ def top_insiders(symbol: str) -> dict:
     Returns:
         dict: Top N insiders ordered least to greatest by volume
     """
-    raw = insiderTransactions(symbol)
+    raw = fetch(f"stock/{symbol}/insider-transactions")
     insider = {"sale": 0, "buy": 0, "total_volume": 0}
     insiders = {}
     for trans in raw:
@@ -461,7 +372,7 @@ def top_insiders(symbol: str) -> dict:
     }
     return out
 
-@cache(platform = "iex")
+@cache(platform = "iex", ttl = market_close())
 def insider_trades(symbol: str, rollingN: int=4) -> dict:
     """Formats, orders, and computes insider transactions for a given symbol.
 
@@ -471,7 +382,7 @@ def insider_trades(symbol: str, rollingN: int=4) -> dict:
     Returns:
         dict: Dictionary containing insider transaction data
     """
-    raw = insiderTransactions(symbol)
+    raw = fetch(f"stock/{symbol}/insider-transactions")
     sale_vol, purch_vol, total_vol = list(), list(), list()
     out = {
         "symbol": symbol,
@@ -508,7 +419,7 @@ def insider_trades(symbol: str, rollingN: int=4) -> dict:
     out["transactions"] = transactions[3:]
     return out
 
-@cache(platform = "iex")
+@cache(platform = "iex", ttl = market_close())
 def insider_pie(symbol: str, n: int=3) -> dict:
     """Returns the insider transactions as a fraction
 
@@ -520,7 +431,7 @@ def insider_pie(symbol: str, n: int=3) -> dict:
     """
     if n not in [3, 6, 12]: 
         raise Exception("Param n not [3, 6, 12]")
-    raw = insiderTransactions(symbol)
+    raw = fetch(f"stock/{symbol}/insider-transactions")
     out = {
         "symbol": symbol,
         "data": {
@@ -545,9 +456,9 @@ def insider_pie(symbol: str, n: int=3) -> dict:
     out["data"] = list(out["data"].values())
     return out
 
-@cache(platform = "iex")   
+@cache(platform = "iex", ttl = company_ttl)
 def search_terms(symbol: str) -> dict:
-    data = company(symbol)
+    data = fetch(f"stock/{symbol}/company")
     comp, sec = data["companyName"], data["securityName"]
     remove_words = [" Company", " company", " LLC", " llc", "corporation", " corp", " Co", " co", ".", ".com", " Inc", "Group"]
     for _word in remove_words:
@@ -0,0 +1,116 @@
+""" peer_graph - every symbol's peers, plus the reverse index peer -> symbols
+
+compareStat, calcSharpe, compare_performance and compare_ceo_comp all start from the
+same peers list. Peers are cached like any other entry ("iex", symbol, "peers") for
+peer_graph_ttl (peers change rarely), so they are bounded by cache_limit, shared and
+persisted by the cache tiers, and cleared by flush_cache. This module adds the
+reverse index peer -> symbols listing it, so every analytic shares one lookup and
+fetches for peers shared between groups can be deduplicated (see peer_universe).
+The reverse index is only a hint - symbols_with_peer checks it against the cache.
+"""
+
+from threading import Lock
+from .settings import peer_graph_ttl
+from .providers import fetch
+from .dec_cache import lookup_cache, append_cache, pop_cache
+
+# peer -> set of symbols whose peers listed it when last seen
+REVERSE = {}
+PEER_LOCK = Lock()
+
+def peer_entry(symbol: str) -> tuple:
+    """Cache entry (platform, key, func) holding a symbol's peers."""
+    return ("iex", symbol, "peers")
+
+def _index(symbol: str, peers: tuple):
+    with PEER_LOCK:
+        for peer in peers:
+            REVERSE.setdefault(peer, set()).add(symbol)
+
+def lookup_peers(symbol: str) -> tuple:
+    """Returns the cached peers of a symbol.
+
+    Args:
+        symbol (str): Supported IEX symbol
+
+    Returns:
+        tuple: Peers, or None if they are not cached or have expired
+    """
+    peers, meta = lookup_cache(*peer_entry(symbol))
+    if meta is None: return None
+    _index(symbol, peers)
+    return peers
+
+def store_peers(symbol: str, peers: list, ttl: float = None) -> tuple:
+    """Caches the peers of a symbol and updates the reverse index.
+
+    Args:
+        symbol (str): Supported IEX symbol
+        peers (list): Its peers
+        ttl (float): Seconds to keep them - defaults to peer_graph_ttl
+
+    Returns:
+        tuple: The stored peers
+    """
+    peers = tuple(peers)
+    append_cache(*peer_entry(symbol), peers, peer_graph_ttl if ttl is None else ttl, "peers")
+    _index(symbol, peers)
+    return peers
+
+def symbols_with_peer(peer: str) -> frozenset:
+    """Reverse lookup - the cached symbols listing a peer.
+
+    Symbols whose peers have since changed or expired are dropped from the index.
+
+    Args:
+        peer (str): Supported IEX symbol
+
+    Returns:
+        frozenset: Symbols whose (unexpired) peers include peer
+    """
+    with PEER_LOCK:
+        listed = frozenset(REVERSE.get(peer, ()))
+    out = frozenset(symbol for symbol in listed if peer in (lookup_peers(symbol) or ()))
+    with PEER_LOCK:
+        if peer in REVERSE: REVERSE[peer] -= listed - out
+    return out
+
+def peer_universe(symbols: list) -> list:
+    """Every symbol and cached peer of the given symbols, each once, in first-seen order.
+
+    Args:
+        symbols (list): Supported IEX symbols
+
+    Returns:
+        list: The symbols followed by their peers, deduplicated
+    """
+    out = dict.fromkeys(symbols)
+    for symbol in symbols:
+        out.update(dict.fromkeys(lookup_peers(symbol) or ()))
+    return list(out.keys())
+
+def peers(symbol: str) -> tuple:
+    """Returns the peers of a symbol, fetching them from the data provider if not cached.
+
+    Args:
+        symbol (str): Supported IEX symbol
+
+    Returns:
+        tuple: Its peers
+    """
+    stored = lookup_peers(symbol)
+    if stored is not None: return stored
+    return store_peers(symbol, fetch(f"stock/{symbol}/peers"))
+
+def clear_peers() -> bool:
+    """Removes every indexed symbol's peers from the cache and empties the reverse index.
+
+    Returns:
+        bool: Whether the operation was successful
+    """
+    with PEER_LOCK:
+        symbols = set().union(*REVERSE.values())
+        REVERSE.clear()
+    for symbol in symbols:
+        pop_cache(*peer_entry(symbol))
+    return True
@@ -0,0 +1,398 @@
+""" political - ingestion and storage of the House/Senate stock-trade disclosures
+
+The political_trades feeds are single JSON arrays of every disclosure ever filed. They
+are streamed (see providers.stream) and parsed one record at a time (iter_json_array),
+so the raw text and a full list of raw dicts never sit in memory. Each record is
+normalized as it arrives (normalize_trade) - dates parsed once, Senate fields mapped
+onto the House vocabulary, amount ranges reduced to their midpoint - and appended to a
+TradeTable. The table is columnar (categoricals, int64 timestamps and amounts) so the
+aggregations in sigma7 work on arrays, and keeps an index from ticker to its row ids
+so symbol/date-window queries (TradeTable.query) are a dict lookup and two bisects.
+
+Every political_trades_ttl the feeds are checked again with conditional GETs (ETag /
+Last-Modified), so unchanged feeds are not downloaded. A changed feed is streamed,
+but only records not already in the table (by fingerprint and occurrence) are
+normalized and merged into a copy of the table, and rows whose record has left the
+feed (e.g. corrected upstream) are dropped from it. The copy then replaces the
+current table.
+
+The table lives in the sigma7 cache (TRADES) for political_trades_keep, so it counts
+against cache_limit, is cleared by flush_cache, and is persisted and shared by the
+cache tiers - a cold worker starts from the stored table and its validators instead
+of downloading the feeds. In memory it is held decoded (see cache_keep_decoded), so
+the cached entry is the only copy and reads cost a lookup.
+"""
+
+from codecs import getincrementaldecoder
+from collections import Counter
+from hashlib import blake2b
+from json import JSONDecoder
+from logging import info, warning
+from sys import intern
+from time import time
+import numpy as np
+import pandas as pd
+from .settings import political_trades, political_trades_ttl, political_trades_keep
+from .dec_cache import lookup_cache, append_cache, single_flight, revalidate
+from .providers import stream_if_changed
+from .utils import parse_dates, date_to_ts, parse_amount
+
+# normalized trade fields, in column order - disclosure_date as filed, date as YYYY-MM-DD
+FIELDS = [
+    "chamber", "disclosure_date", "date", "timestamp", "transaction_date", "owner", "ticker",
+    "asset_description", "type", "amount", "representative", "district", "ptr_link"
+]
+
+# TradeTable columns - FIELDS plus the midpoint of the amount range in dollars and the raw record's fingerprint
+COLUMNS = FIELDS + ["amount_mid", "fingerprint"]
+NUMERIC = ["timestamp", "amount_mid", "fingerprint"]
+CATEGORICAL = ["chamber", "disclosure_date", "date", "transaction_date", "owner", "ticker", "type", "amount", "representative", "district"]
+
+# raw fields (either chamber) identifying a transaction, see fingerprint
+IDENTITY = [
+    "disclosure_date", "transaction_date", "owner", "ticker", "asset_description",
+    "type", "amount", "representative", "senator", "district", "ptr_link"
+]
+
+# Senate transaction types -> House transaction types
+TYPES = {
+    "Purchase": "purchase",
+    "Sale (Full)": "sale_full",
+    "Sale (Partial)": "sale_partial",
+    "Sale": "sale_full",
+    "Exchange": "exchange"
+}
+
+# cache entry holding {table, validators (chamber -> {etag, last_modified})}
+TRADES = ("sigma7", "political", "trade_table")
+
+_WHITESPACE = " \t\n\r"
+
+def iter_json_array(chunks):
+    """Yields the elements of a top-level JSON array as its bytes arrive.
+
+    Args:
+        chunks (iterator): Chunks of UTF-8 encoded JSON
+
+    Returns:
+        iterator: Each parsed element of the array
+    """
+    decoder = JSONDecoder()
+    text = getincrementaldecoder("utf-8")()
+    buf, pos, started = "", 0, False
+    for chunk in chunks:
+        buf = buf[pos:] + text.decode(chunk)
+        pos = 0
+        while True:
+            while pos < len(buf) and (buf[pos] in _WHITESPACE or (started and buf[pos] == ",")): pos += 1
+            if pos == len(buf): break
+            if not started:
+                if buf[pos] != "[": raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]": return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                break
+            yield item
+            pos = end
+    raise ValueError("Unexpected end of JSON array")
+
+def fingerprint(raw: dict, chamber: str) -> int:
+    """A stable 64 bit id for a raw feed record, from the fields in IDENTITY."""
+    key = "\x1f".join([chamber, *[str(raw.get(field, "")) for field in IDENTITY]])
+    return int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), "big", signed=True)
+
+def object_array(values: list) -> np.ndarray:
+    """1-d object array of values, even if some of them are lists."""
+    return np.fromiter(values, dtype=object, count=len(values))
+
+def empty_column(field: str):
+    if field in NUMERIC: return np.array([], dtype=np.int64)
+    if field in CATEGORICAL: return pd.Categorical([])
+    return np.array([], dtype=object)
+
+def amount_midpoint(amount: str) -> int:
+    """Midpoint of a disclosed amount range like "$1,001 - $15,000" - 0 if it cannot be parsed."""
+    try:
+        return parse_amount(amount)
+    except (AttributeError, ValueError):
+        return 0
+
+def normalize_trade(raw: dict, chamber: str) -> dict:
+    """Normalizes a House or Senate disclosure into FIELDS.
+
+    type, representative and district use the House vocabulary. Raw fields without a
+    FIELDS counterpart (e.g. disclosure_year, senator, comment) are kept under extra.
+
+    Args:
+        raw (dict): Record from a political_trades feed
+        chamber (str): [house, senate]
+
+    Returns:
+        dict: The trade - date as YYYY-MM-DD plus its timestamp, amount_mid, and extra
+    """
+    _date = parse_dates(raw["disclosure_date"])
+    return {
+        "chamber": chamber,
+        "disclosure_date": raw["disclosure_date"],
+        "date": _date,
+        "timestamp": date_to_ts(_date),
+        "transaction_date": raw.get("transaction_date"),
+        "owner": raw.get("owner"),
+        "ticker": raw.get("ticker"),
+        "asset_description": raw.get("asset_description"),
+        "type": TYPES.get(raw.get("type"), raw.get("type")),
+        "amount": raw.get("amount"),
+        "representative": raw.get("representative") or raw.get("senator"),
+        "district": raw.get("district") or raw.get("state"),
+        "ptr_link": raw.get("ptr_link"),
+        "amount_mid": amount_midpoint(raw.get("amount")),
+        "extra": {_key: val for _key, val in raw.items() if _key not in FIELDS}
+    }
+
+class TradeTable:
+    """Political trades stored column by column (see COLUMNS).
+
+    Repetitive string columns (CATEGORICAL) are pandas Categoricals, timestamp and
+    amount_mid are int64 arrays and the rest are object arrays, including one per
+    raw feed field outside FIELDS (extras - None where a record lacks it). Appended trades are
+    buffered in pending and merged in by sort, which also orders the rows newest
+    first and rebuilds index: ticker -> (negated timestamps, row ids), both ascending,
+    so a ticker's rows come out newest first and date windows are found by bisection.
+    rejected maps chamber -> Counter of the fingerprints of its malformed records.
+    """
+
+    def __init__(self):
+        self.columns = {field: empty_column(field) for field in COLUMNS}
+        self.pending = {field: list() for field in COLUMNS}
+        self.pending_extra = list()
+        self.extras = list()
+        self.rejected = {}
+        self.index = {}
+
+    def copy(self):
+        """Returns a table sharing this one's (never modified) arrays, with nothing pending."""
+        table = TradeTable()
+        table.columns = dict(self.columns)
+        table.extras = list(self.extras)
+        table.rejected = dict(self.rejected)
+        table.index = self.index
+        return table
+
+    def __len__(self) -> int:
+        return len(self.columns["timestamp"])
+
+    def __sizeof__(self) -> int:
+        _size = object.__sizeof__(self)
+        for column in self.columns.values():
+            if isinstance(column, pd.Categorical):
+                _size += column.codes.nbytes + int(column.categories.memory_usage(deep=True))
+            else: _size += int(pd.Series(column, copy=False).memory_usage(index=False, deep=True))
+        for keys, rows in self.index.values():
+            _size += keys.nbytes + rows.nbytes
+        return _size
+
+    def append(self, trade: dict):
+        """Buffers a normalized trade - it shows up in the table after the next sort."""
+        for field, column in self.pending.items():
+            val = trade[field]
+            column.append(intern(val) if isinstance(val, str) else val)
+        self.pending_extra.append({intern(_key): intern(val) if isinstance(val, str) else val for _key, val in trade.get("extra", {}).items()})
+
+    def sort(self):
+        """Merges the pending trades, orders the rows by disclosure timestamp, newest first, and rebuilds the index."""
+        columns = {}
+        for field in COLUMNS:
+            if field in NUMERIC: new = np.array(self.pending[field], dtype=np.int64)
+            else: new = object_array(self.pending[field])
+            columns[field] = np.concatenate([np.asarray(self.columns[field], dtype=new.dtype), new])
+        extras = list(dict.fromkeys([*self.extras, *[_key for extra in self.pending_extra for _key in extra]]))
+        for name in extras:
+            old = self.columns[name] if name in self.columns else np.full(len(self), None, dtype=object)
+            columns[name] = np.concatenate([old, object_array([extra.get(name) for extra in self.pending_extra])])
+        order = np.argsort(-columns["timestamp"], kind="stable")
+        self.columns = {field: pd.Categorical(column[order]) if field in CATEGORICAL else column[order] for field, column in columns.items()}
+        self.pending = {field: list() for field in COLUMNS}
+        self.pending_extra = list()
+        self.extras = extras
+        self.build_index()
+
+    def fingerprints(self, chamber: str) -> Counter:
+        """Fingerprint -> number of rows of a chamber."""
+        rows = np.flatnonzero(self.take("chamber") == chamber)
+        return Counter(self.columns["fingerprint"][rows].tolist())
+
+    def retain(self, chamber: str, counts: dict) -> int:
+        """Drops rows of a chamber beyond counts[fingerprint] - pending trades are not affected.
+
+        Args:
+            chamber (str): [house, senate]
+            counts (dict): Fingerprint -> occurrences in the chamber's feed
+
+        Returns:
+            int: Number of rows dropped
+        """
+        rows = np.flatnonzero(self.take("chamber") == chamber)
+        kept, drop = Counter(), list()
+        for i, _id in zip(rows.tolist(), self.columns["fingerprint"][rows].tolist()):
+            kept[_id] += 1
+            if kept[_id] > counts.get(_id, 0): drop.append(i)
+        if not drop: return 0
+        keep = np.ones(len(self), dtype=bool)
+        keep[drop] = False
+        self.columns = {field: column[keep] for field, column in self.columns.items()}
+        self.index = {}
+        return len(drop)
+
+    def build_index(self):
+        """Rebuilds ticker -> (negated timestamps, row ids) - expects sorted rows."""
+        tickers, timestamps = self.columns["ticker"], self.columns["timestamp"]
+        valid = np.flatnonzero(tickers.codes >= 0)
+        codes = tickers.codes[valid]
+        order = valid[np.argsort(codes, kind="stable")]
+        bounds = np.cumsum(np.bincount(codes, minlength=len(tickers.categories)))[:-1]
+        self.index = {ticker: (-timestamps[rows], rows) for ticker, rows in zip(tickers.categories, np.split(order, bounds)) if len(rows)}
+
+    def query(self, ticker: str, start: int = None, end: int = None) -> np.ndarray:
+        """Row ids of a ticker's trades disclosed within [start, end], newest first.
+
+        Args:
+            ticker (str): Ticker as it appears in the feeds
+            start (int): Earliest disclosure timestamp - None for no bound
+            end (int): Latest disclosure timestamp - None for no bound
+
+        Returns:
+            np.ndarray: Row ids
+        """
+        if ticker not in self.index: return np.array([], dtype=np.int64)
+        keys, rows = self.index[ticker]
+        lo = 0 if end is None else np.searchsorted(keys, -end, "left")
+        hi = len(keys) if start is None else np.searchsorted(keys, -start, "right")
+        return rows[lo:hi]
+
+    def take(self, field: str, rows = None) -> np.ndarray:
+        """Values of a column for some rows (all if rows is None) - categoricals decoded, missing as None."""
+        column = self.columns[field]
+        if rows is None: rows = slice(None)
+        if isinstance(column, pd.Categorical):
+            return np.append(np.asarray(column.categories, dtype=object), None)[column.codes[rows]]
+        return column[rows]
+
+    def row(self, i: int) -> dict:
+        return self.rows([i])[0]
+
+    def rows(self, rows = None) -> list:
+        """Returns rows as dicts of FIELDS plus the extras each record has - every row if rows is None."""
+        values = [self.take(field, rows).tolist() for field in FIELDS]
+        extras = [self.take(name, rows).tolist() for name in self.extras]
+        out = [dict(zip(FIELDS, row)) for row in zip(*values)]
+        for name, column in zip(self.extras, extras):
+            for row, val in zip(out, column):
+                if val is not None: row[name] = val
+        return out
+
+def ingest(chunks, chamber: str, table: TradeTable, known: dict = None) -> tuple:
+    """Parses a feed as it streams in and appends its new trades to a table.
+
+    Records are counted per fingerprint; the first known[fingerprint] occurrences are
+    already in the table (or known to be malformed) and are skipped without being
+    normalized, so identical records in a feed are each kept once. Records that cannot
+    be normalized (e.g. malformed dates) are skipped and counted in rejected.
+
+    Args:
+        chunks (iterator): The feed's raw JSON body
+        chamber (str): [house, senate]
+        table (TradeTable): Table to append to
+        known (dict): Fingerprint -> rows of this chamber already in table - defaults to none
+
+    Returns:
+        tuple: (number of trades appended, Counter of every fingerprint in the feed, Counter of the new malformed ones)
+    """
+    if known is None: known = {}
+    counts, rejected = Counter(), Counter()
+    n = 0
+    for raw in iter_json_array(chunks):
+        _id = fingerprint(raw, chamber)
+        counts[_id] += 1
+        if counts[_id] <= known.get(_id, 0): continue
+        try:
+            trade = normalize_trade(raw, chamber)
+        except (KeyError, ValueError, TypeError, AttributeError):
+            rejected[_id] += 1
+            continue
+        trade["fingerprint"] = _id
+        table.append(trade)
+        n += 1
+    if rejected: warning(f"Skipped {sum(rejected.values())} malformed {chamber} trades")
+    return n, counts, rejected
+
+def update_trades(table: TradeTable = None, validators: dict = None) -> tuple:
+    """Brings a table in line with the political_trades feeds.
+
+    Feeds are requested conditionally with their validators and skipped if unchanged.
+    For a changed feed, records not yet in the table are merged and rows whose record
+    is no longer in the feed (e.g. corrected upstream) are dropped. Changes go into a
+    copy of table, so readers of the current table are unaffected and a failed
+    download leaves it as it was.
+
+    Args:
+        table (TradeTable): Current table - None to load everything
+        validators (dict): Chamber -> validators of its last download
+
+    Returns:
+        tuple: (table, validators, trades added, trades removed) - table is the given one if nothing changed
+    """
+    validators = dict(validators or {})
+    _table = TradeTable() if table is None else table.copy()
+    added = removed = 0
+    for chamber, ep in political_trades.items():
+        chunks, validators[chamber] = stream_if_changed(ep, validators.get(chamber))
+        if chunks is None: continue
+        rejected = _table.rejected.get(chamber, Counter())
+        n, counts, new = ingest(chunks, chamber, _table, _table.fingerprints(chamber) + rejected)
+        _table.rejected[chamber] = (rejected & counts) + new
+        added += n
+        removed += _table.retain(chamber, counts)
+    if not (added or removed) and table is not None and _table.rejected == table.rejected: return table, validators, 0, 0
+    _table.sort()
+    return _table, validators, added, removed
+
+def refresh_trades(full: bool = False) -> TradeTable:
+    """Merges the feeds' new trades into the cached table (see update_trades) and caches the result.
+
+    Args:
+        full (bool): Ignore the cached table and load everything - defaults to False
+
+    Returns:
+        TradeTable: The updated table
+    """
+    value, meta = (None, None) if full else lookup_cache(*TRADES)
+    if meta is None: value = {"table": None, "validators": {}}
+    table, validators, added, removed = update_trades(value["table"], value["validators"])
+    if added or removed: info(f"Merged {added} new and dropped {removed} removed political trades")
+    value = {"table": table, "validators": validators}
+    append_cache(*TRADES, value, political_trades_keep, "trade_table")
+    return table
+
+def trade_table(refresh: bool = False) -> TradeTable:
+    """Returns the political trades table, checking the feeds for new trades every political_trades_ttl.
+
+    Only a cold start (or refresh) waits for the feeds. Once the cached table is older
+    than political_trades_ttl it is still returned immediately, while one background
+    thread merges the new trades (see dec_cache.revalidate). If that fails, the old
+    table keeps being served and the next call tries again.
+
+    Args:
+        refresh (bool): Reload everything now - defaults to False
+
+    Returns:
+        TradeTable: The trades
+    """
+    if refresh: return single_flight((*TRADES[:2], "full_reload"), lambda: refresh_trades(full = True))
+    value, meta = lookup_cache(*TRADES)
+    if meta is None: return single_flight(TRADES, refresh_trades)
+    if time() - meta["ts"] >= political_trades_ttl: revalidate(TRADES, refresh_trades)
+    return value["table"]
@@ -0,0 +1,173 @@
+""" price_store - one daily price history per symbol, sliced for every frame
+
+sharpe_ratio, full_returns, dividend_yield and corAnalysis all need the same daily
+bars over different timeframes. Instead of fetching and caching each timeframe
+separately, the store keeps a single date-indexed history per symbol in the sigma7
+cache (entry ("iex", symbol, "price_history")) covering the longest frame fetched so
+far, and serves shorter frames by slicing it. A longer frame replaces the history
+with a longer fetch. Histories are never fetched shorter than price_history_min.
+
+After each market close a history goes stale. Rather than refetching it in full, the
+store fetches the shortest range that reaches back to its last bar (UPDATE_FRAMES)
+and appends the new bars.
+"""
+
+from time import time
+import pandas as pd
+from .settings import price_history_min, price_history_ttl
+from .dec_cache import lookup_cache, append_cache, single_flight, market_close, entry_expiry
+from .providers import fetch
+from .utils import to_chart_df
+
+# chart ranges the store understands -> how far back they reach
+FRAMES = {
+    "5d": pd.DateOffset(days=5),
+    "1m": pd.DateOffset(months=1),
+    "3m": pd.DateOffset(months=3),
+    "6m": pd.DateOffset(months=6),
+    "ytd": None,
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+    "max": pd.DateOffset(years=15)
+}
+
+# ranges tried, shortest first, when topping up a stale history
+UPDATE_FRAMES = ["5d", "1m", "3m"]
+
+def frame_start(frame: str, asof: pd.Timestamp) -> pd.Timestamp:
+    """First date a frame covers when requested on asof."""
+    if frame == "ytd": return pd.Timestamp(asof.year, 1, 1)
+    return asof - FRAMES[frame]
+
+def history_frame(frame: str) -> str:
+    """The frame to fetch for a request - frame itself or price_history_min, whichever reaches further back."""
+    today = pd.Timestamp.today().normalize()
+    if frame_start(price_history_min, today) < frame_start(frame, today): return price_history_min
+    return frame
+
+def compact(prices: pd.DataFrame) -> pd.DataFrame:
+    """Keeps the numeric columns of a chart as float64, indexed by date in ascending order."""
+    prices = prices.select_dtypes("number").astype("float64")
+    prices.index = pd.to_datetime(prices.index)
+    prices.index.name = "date"
+    return prices.sort_index()
+
+def slice_history(history: dict, frame: str) -> pd.DataFrame:
+    """Slices a frame out of a stored history, or returns None if the history does not reach back far enough."""
+    start = frame_start(frame, history["asof"])
+    if start < frame_start(history["frame"], history["asof"]): return None
+    prices = history["prices"]
+    return prices.iloc[prices.index.searchsorted(start, side="right"):]
+
+def is_stale(history: dict) -> bool:
+    """Whether a market close has passed since the history was last fetched or updated."""
+    return time() >= entry_expiry(history["ts"], market_close())
+
+def update_frame(history: dict) -> str:
+    """The shortest chart range reaching back to the last stored bar, or None if the gap is too long to top up."""
+    today = pd.Timestamp.today().normalize()
+    last = history["prices"].index.max()
+    for frame in UPDATE_FRAMES:
+        if pd.isna(last) or frame_start(frame, today) < last: return frame
+    return None
+
+def stored_history(symbol: str) -> dict:
+    """Returns a symbol's stored history {frame, asof, ts, prices}, stale or not, or None."""
+    history, meta = lookup_cache("iex", symbol, "price_history")
+    if meta is None: return None
+    return history
+
+def lookup_history(symbol: str, frame: str) -> pd.DataFrame:
+    """Returns a frame of a symbol's prices if the stored history covers it and is fresh.
+
+    Args:
+        symbol (str): Supported IEX symbol
+        frame (str): Chart range [5d, 1m, 3m, 6m, ytd, 1y, 2y, 5y, max]
+
+    Returns:
+        pd.DataFrame: Daily bars (read-only), or None if the frame is not covered
+    """
+    history = stored_history(symbol)
+    if history is None or is_stale(history): return None
+    return slice_history(history, frame)
+
+def plan_fetch(symbol: str, frame: str) -> tuple:
+    """Works out what to fetch for a frame that lookup_history could not serve.
+
+    A stale history that covers the frame is topped up with the bars since its last
+    one (update_frame); anything else is fetched in full (history_frame).
+
+    Returns:
+        tuple: (chart range to fetch, history to update or None for a full fetch)
+    """
+    history = stored_history(symbol)
+    if history is not None and slice_history(history, frame) is not None:
+        _frame = update_frame(history)
+        if _frame is not None: return _frame, history
+    return history_frame(frame), None
+
+def store_history(symbol: str, frame: str, prices: pd.DataFrame, asof: pd.Timestamp = None) -> dict:
+    """Stores a symbol's price history, replacing whatever was there.
+
+    Args:
+        symbol (str): Supported IEX symbol
+        frame (str): Chart range prices were fetched with
+        prices (pd.DataFrame): Chart output, date-indexed
+        asof (pd.Timestamp): Day prices were fetched - defaults to today
+
+    Returns:
+        dict: The stored history {frame, asof, ts, prices}
+    """
+    if asof is None: asof = pd.Timestamp.today().normalize()
+    history = {"frame": frame, "asof": asof, "ts": time(), "prices": compact(prices)}
+    append_cache("iex", symbol, "price_history", history, price_history_ttl, "price_history")
+    return history
+
+def update_history(symbol: str, history: dict, bars: pd.DataFrame) -> dict:
+    """Appends the bars newer than a stored history's last one and stores the result.
+
+    change and changePercent of the new bars are derived from the closes, chained
+    onto the last stored close, and bars older than the history's frame are dropped.
+
+    Args:
+        symbol (str): Supported IEX symbol
+        history (dict): History to update, from stored_history
+        bars (pd.DataFrame): Recent chart output, date-indexed
+
+    Returns:
+        dict: The stored history {frame, asof, ts, prices}
+    """
+    prices = history["prices"]
+    bars = compact(bars).reindex(columns=prices.columns)
+    bars = bars.iloc[bars.index.searchsorted(prices.index.max(), side="right"):] if len(prices) else bars
+    if len(bars) and "close" in prices.columns:
+        closes = pd.concat([prices["close"].iloc[-1:], bars["close"]])
+        if "change" in bars.columns: bars["change"] = closes.diff().iloc[1:].round(4)
+        if "changePercent" in bars.columns: bars["changePercent"] = (closes.pct_change().iloc[1:] * 100).round(4)
+    asof = pd.Timestamp.today().normalize()
+    prices = pd.concat([prices, bars])
+    prices = prices.iloc[prices.index.searchsorted(frame_start(history["frame"], asof), side="right"):]
+    return store_history(symbol, history["frame"], prices, asof)
+
+def price_history(symbol: str, frame: str) -> pd.DataFrame:
+    """Returns a frame of a symbol's daily prices, fetching from IEX only what the stored history lacks.
+
+    Args:
+        symbol (str): Supported IEX symbol
+        frame (str): Chart range [5d, 1m, 3m, 6m, ytd, 1y, 2y, 5y, max]
+
+    Returns:
+        pd.DataFrame: Daily bars (read-only), indexed by date in ascending order
+    """
+    prices = lookup_history(symbol, frame)
+    if prices is not None: return prices
+    def compute():
+        _prices = lookup_history(symbol, frame)
+        if _prices is not None: return _prices
+        _frame, history = plan_fetch(symbol, frame)
+        bars = to_chart_df(fetch(f"stock/{symbol}/chart/{_frame}"))
+        if history is None: history = store_history(symbol, _frame, bars)
+        else: history = update_history(symbol, history, bars)
+        return slice_history(history, frame)
+    return single_flight(("iex", symbol, "price_history"), compute)
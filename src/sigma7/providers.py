@@ -0,0 +1,247 @@
+""" providers - where sigma7's market data comes from
+
+Every upstream fetch goes through the current provider (see get_provider), addressed by
+an IEX path such as "stock/MSFT/chart/1y" or an absolute URL (political trades):
+
+- IEXProvider fetches live data from IEX Cloud (and plain HTTP for absolute URLs),
+  through the pooled, rate limited sessions.
+- RecordingProvider wraps another provider and writes each response to a fixture
+  file under a directory.
+- ReplayProvider serves those fixture files and never touches the network, so the
+  analytics can be run, tested, and profiled offline and deterministically.
+
+data_provider and data_fixtures pick the provider at startup; set_provider swaps it
+at runtime.
+"""
+
+import asyncio
+from hashlib import sha1
+from json import dumps, load, loads
+from os import environ, makedirs, path as os_path
+from re import sub
+import aiohttp
+from pyEX import PyEXception
+from .settings import iex_base, data_provider, data_fixtures, stream_chunk_size
+from .sessions import request, get_aio_session
+from .throttle import call_async, provider_of
+
+PROVIDER = {"provider": None}
+
+def _absolute(path: str) -> bool:
+    return path.startswith("http://") or path.startswith("https://")
+
+class IEXProvider:
+    """Live data from IEX Cloud, authenticated with the IEX_TOKEN environment variable."""
+
+    def url(self, path: str) -> str:
+        return path if _absolute(path) else f"{iex_base}/{path}"
+
+    def params(self, path: str, params: dict) -> dict:
+        return params if _absolute(path) else dict(params, token=environ["IEX_TOKEN"])
+
+    def get(self, path: str, **params) -> object:
+        """GETs an IEX path or absolute URL and returns the parsed JSON.
+
+        Raises:
+            PyEXception: on a non 200 response, like pyEX
+        """
+        resp = request("GET", self.url(path), params=self.params(path, params))
+        if resp.status_code != 200:
+            raise PyEXception("Response %d - " % resp.status_code, resp.text)
+        return loads(resp.text)
+
+    def stream(self, path: str, **params):
+        """GETs an IEX path or absolute URL and yields the (decompressed) body in chunks as it downloads.
+
+        Raises:
+            PyEXception: on a non 200 response, like pyEX
+        """
+        return self.stream_if_changed(path, None, **params)[0]
+
+    def stream_if_changed(self, path: str, validators: dict = None, **params) -> tuple:
+        """Conditional stream - sends the ETag/Last-Modified validators of a previous response.
+
+        Args:
+            path (str): IEX path after the API version, or an absolute URL
+            validators (dict): {etag, last_modified} from a previous call, or None
+            **params: Query parameters
+
+        Returns:
+            tuple: (chunks, validators) - chunks is None if the resource has not changed
+        """
+        validators = validators or {}
+        headers = {}
+        if validators.get("etag"): headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"): headers["If-Modified-Since"] = validators["last_modified"]
+        resp = request("GET", self.url(path), params=self.params(path, params), headers=headers, stream=True)
+        if resp.status_code == 304:
+            resp.close()
+            return None, validators
+        if resp.status_code != 200:
+            raise PyEXception("Response %d - " % resp.status_code, resp.text)
+        return resp.iter_content(stream_chunk_size), {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+
+    async def get_async(self, path: str, **params) -> object:
+        """asyncio version of get - at most iex_concurrency requests at a time per event loop."""
+        session, limit = await get_aio_session()
+        url = self.url(path)
+        params = self.params(path, params)
+        async def send():
+            async with limit:
+                async with session.get(url, params=params) as resp:
+                    return resp.status, resp.headers, await resp.text()
+        status, _, body = await call_async(provider_of(url), send, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+        if status != 200:
+            raise PyEXception("Response %d - " % status, body)
+        return loads(body)
+
+def fixture_file(fixtures: str, path: str, params: dict) -> str:
+    """Returns the fixture file a request is recorded in - the token is left out of the key."""
+    params = {_key: val for _key, val in params.items() if _key != "token"}
+    digest = sha1(dumps([path, params], sort_keys=True, default=str).encode()).hexdigest()[:16]
+    slug = sub(r"[^A-Za-z0-9]+", "_", path.split("://")[-1]).strip("_")[-60:]
+    return os_path.join(fixtures, f"{slug}-{digest}.json")
+
+class ReplayProvider:
+    """Serves responses recorded by RecordingProvider.
+
+    Args:
+        fixtures (str): Directory of fixture files
+    """
+
+    def __init__(self, fixtures: str):
+        self.fixtures = fixtures
+
+    def get(self, path: str, **params) -> object:
+        """Returns the recorded response for a request.
+
+        Raises:
+            PyEXception: if the request was never recorded
+        """
+        file = fixture_file(self.fixtures, path, params)
+        if not os_path.exists(file):
+            raise PyEXception("Response 404 - ", f"No fixture for {path} {params}")
+        with open(file) as f:
+            return load(f)["response"]
+
+    async def get_async(self, path: str, **params) -> object:
+        return self.get(path, **params)
+
+    def stream(self, path: str, **params):
+        return self.stream_if_changed(path, None, **params)[0]
+
+    def stream_if_changed(self, path: str, validators: dict = None, **params) -> tuple:
+        """Conditional stream - the ETag of a fixture is a hash of its content."""
+        raw = dumps(self.get(path, **params)).encode()
+        etag = sha1(raw).hexdigest()
+        if validators and validators.get("etag") == etag: return None, validators
+        return (raw[i:i + stream_chunk_size] for i in range(0, len(raw), stream_chunk_size)), {"etag": etag, "last_modified": None}
+
+class RecordingProvider:
+    """Passes requests on to another provider and records every response.
+
+    Args:
+        fixtures (str): Directory to write fixture files to - created if missing
+        provider (object): Provider to record - defaults to IEXProvider
+    """
+
+    def __init__(self, fixtures: str, provider = None):
+        self.fixtures = fixtures
+        self.provider = provider if provider is not None else IEXProvider()
+        makedirs(fixtures, exist_ok=True)
+
+    def record(self, path: str, params: dict, response: object) -> object:
+        with open(fixture_file(self.fixtures, path, params), "w") as f:
+            f.write(dumps({"path": path, "params": {_key: val for _key, val in params.items() if _key != "token"}, "response": response}, default=str))
+        return response
+
+    def get(self, path: str, **params) -> object:
+        return self.record(path, params, self.provider.get(path, **params))
+
+    async def get_async(self, path: str, **params) -> object:
+        return self.record(path, params, await self.provider.get_async(path, **params))
+
+    def stream(self, path: str, **params):
+        return self.stream_if_changed(path, None, **params)[0]
+
+    def stream_if_changed(self, path: str, validators: dict = None, **params) -> tuple:
+        chunks, validators = self.provider.stream_if_changed(path, validators, **params)
+        if chunks is None: return None, validators
+        def recorded():
+            _chunks = list()
+            for chunk in chunks:
+                _chunks.append(chunk)
+                yield chunk
+            self.record(path, params, loads(b"".join(_chunks)))
+        return recorded(), validators
+
+def make_provider(name: str, fixtures: str = None):
+    """Builds a provider by name.
+
+    Args:
+        name (str): [iex, record, replay]
+        fixtures (str): Fixture directory for record/replay
+
+    Returns:
+        object: The provider
+    """
+    if name == "iex": return IEXProvider()
+    if not fixtures: raise ValueError(f"The {name} provider needs a fixture directory (data_fixtures)")
+    if name == "record": return RecordingProvider(fixtures)
+    if name == "replay": return ReplayProvider(fixtures)
+    raise ValueError(f"Unknown data provider {name} - options are iex, record, and replay")
+
+def get_provider():
+    """Returns the current provider, built from data_provider on first use."""
+    if PROVIDER["provider"] is None: PROVIDER["provider"] = make_provider(data_provider, data_fixtures)
+    return PROVIDER["provider"]
+
+def set_provider(provider) -> bool:
+    """Replaces the current provider - None goes back to data_provider.
+
+    Returns:
+        bool: Whether the operation was successful
+    """
+    PROVIDER["provider"] = provider
+    return True
+
+def fetch(path: str, **params) -> object:
+    """GETs an IEX path or absolute URL from the current provider.
+
+    Args:
+        path (str): IEX path after the API version, e.g. "stock/MSFT/company", or an absolute URL
+        **params: Query parameters
+
+    Returns:
+        object: Parsed JSON response
+    """
+    return get_provider().get(path, **params)
+
+def stream(path: str, **params):
+    """Like fetch, but yields the raw JSON body in chunks as it arrives instead of parsing it.
+
+    Args:
+        path (str): IEX path after the API version, or an absolute URL
+        **params: Query parameters
+
+    Returns:
+        iterator: Chunks of bytes
+    """
+    return get_provider().stream(path, **params)
+
+def stream_if_changed(path: str, validators: dict = None, **params) -> tuple:
+    """Like stream, but only if the resource changed since the response validators came from.
+
+    Args:
+        path (str): IEX path after the API version, or an absolute URL
+        validators (dict): {etag, last_modified} returned by a previous call, or None
+        **params: Query parameters
+
+    Returns:
+        tuple: (chunks, validators) - chunks is None if the resource has not changed
+    """
+    return get_provider().stream_if_changed(path, validators, **params)
+
+async def fetch_async(path: str, **params) -> object:
+    """asyncio version of fetch."""
+    return await get_provider().get_async(path, **params)
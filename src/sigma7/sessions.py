@@ -0,0 +1,171 @@
+""" sessions - pooled HTTP sessions for sigma7's direct upstream calls
+
+Every direct HTTP call (econ series, political trades) goes through one shared
+requests.Session, so connections are kept alive and reused instead of paying a TCP and
+TLS handshake per call. The session pools up to http_pool_size connections per host,
+asks for gzip, and applies http_timeout to every request. Requests are rate limited
+and retried per provider by throttle.call. pyEX calls module-level requests
+functions; share_with_pyex routes those through the same session. asyncio code gets
+one aiohttp session per event loop (get_aio_session), allowing at most
+iex_concurrency requests in flight at a time, with http_timeout applied. Synchronous
+callers share one long-lived event loop on a background thread (get_loop), so its
+session and connections are reused across calls.
+"""
+
+import asyncio
+from threading import Lock, Thread
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from .settings import http_timeout, http_pool_size, http_pyex, iex_concurrency
+from .throttle import call, provider_of
+
+SESSION = {"session": None}
+SESSION_LOCK = Lock()
+
+# event loop -> (ClientSession, Semaphore)
+AIO_SESSIONS = {}
+
+AIO_LOOP = {"loop": None}
+AIO_LOOP_LOCK = Lock()
+
+def new_session() -> requests.Session:
+    """Builds a requests.Session with sigma7's pool and compression settings.
+
+    Returns:
+        requests.Session: A new session
+    """
+    adapter = HTTPAdapter(pool_connections=http_pool_size, pool_maxsize=http_pool_size)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
+
+def get_session() -> requests.Session:
+    """Returns the shared session, creating it on first use.
+
+    Returns:
+        requests.Session: The shared session
+    """
+    with SESSION_LOCK:
+        if SESSION["session"] is None: SESSION["session"] = new_session()
+        return SESSION["session"]
+
+def close_session() -> bool:
+    """Closes the shared session and its pooled connections.
+
+    Returns:
+        bool: Whether a session was closed
+    """
+    with SESSION_LOCK:
+        session, SESSION["session"] = SESSION["session"], None
+    if session is None: return False
+    session.close()
+    return True
+
+def aio_timeout() -> aiohttp.ClientTimeout:
+    """http_timeout as an aiohttp.ClientTimeout - (connect, read) or total seconds."""
+    if isinstance(http_timeout, (tuple, list)):
+        return aiohttp.ClientTimeout(sock_connect=http_timeout[0], sock_read=http_timeout[1])
+    return aiohttp.ClientTimeout(total=http_timeout)
+
+async def get_aio_session() -> tuple:
+    """Returns the aiohttp session and concurrency limit for the running event loop.
+
+    Returns:
+        tuple: (aiohttp.ClientSession, asyncio.Semaphore)
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in AIO_SESSIONS or AIO_SESSIONS[loop][0].closed:
+        AIO_SESSIONS[loop] = (aiohttp.ClientSession(timeout=aio_timeout()), asyncio.Semaphore(iex_concurrency))
+    return AIO_SESSIONS[loop]
+
+async def close_aio_session() -> bool:
+    """Closes the aiohttp session of the running event loop, if any.
+
+    Returns:
+        bool: Whether a session was closed
+    """
+    session = AIO_SESSIONS.pop(asyncio.get_running_loop(), None)
+    if session is None: return False
+    await session[0].close()
+    return True
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Returns sigma7's long-lived event loop, starting its thread on first use.
+
+    Returns:
+        asyncio.AbstractEventLoop: The loop - submit work with asyncio.run_coroutine_threadsafe
+    """
+    with AIO_LOOP_LOCK:
+        if AIO_LOOP["loop"] is None or AIO_LOOP["loop"].is_closed():
+            loop = asyncio.new_event_loop()
+            Thread(target=loop.run_forever, name="sigma7-aio", daemon=True).start()
+            AIO_LOOP["loop"] = loop
+        return AIO_LOOP["loop"]
+
+def close_loop() -> bool:
+    """Closes the long-lived loop's aiohttp session, then stops the loop.
+
+    Returns:
+        bool: Whether a loop was running
+    """
+    with AIO_LOOP_LOCK:
+        loop, AIO_LOOP["loop"] = AIO_LOOP["loop"], None
+    if loop is None or loop.is_closed(): return False
+    asyncio.run_coroutine_threadsafe(close_aio_session(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    return True
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """Sends a request through the shared session, with http_timeout unless one is given.
+
+    The request is rate limited against its provider, and GETs are retried on failure
+    (see throttle).
+
+    Args:
+        method (str): HTTP method
+        url (str): URL to request
+        **kwargs: Passed to requests.Session.request
+
+    Returns:
+        requests.Response: The response
+    """
+    kwargs.setdefault("timeout", http_timeout)
+    retries = None if method in ["GET", "HEAD"] else 0
+    return call(provider_of(url), lambda: get_session().request(method, url, **kwargs), retries)
+
+def get(url: str, **kwargs) -> requests.Response:
+    """Drop-in for requests.get that uses the shared session."""
+    return request("GET", url, **kwargs)
+
+class PooledRequests:
+    """Stands in for the requests module inside pyEX, sending get/post/delete through the shared session."""
+
+    def __getattr__(self, name: str):
+        return getattr(requests, name)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return request("POST", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return request("DELETE", url, **kwargs)
+
+def share_with_pyex() -> bool:
+    """Makes pyEX's synchronous REST calls use the shared session.
+
+    Returns:
+        bool: Whether pyEX was patched
+    """
+    try:
+        import pyEX.common.urls as urls
+    except ImportError:
+        return False
+    urls.requests = PooledRequests()
+    return True
+
+if http_pyex: share_with_pyex()
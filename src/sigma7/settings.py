@@ -53,11 +53,59 @@ econ_keys = {
 }
 
 econ_ep = "https://cloud.iexapis.com/stable/time-series/economic/{}?token={}&range={}"
+iex_base = "https://cloud.iexapis.com/stable"
+data_provider = "iex" # [iex, record, replay] - where market data comes from (providers)
+data_fixtures = None # fixture directory for the record and replay providers
+stream_chunk_size = 65536 # bytes per chunk when streaming large responses (providers.stream)
+iex_concurrency = 8 # max concurrent IEX requests per event loop (aio_iex)
+iex_batch_size = 100 # max symbols per /stock/market/batch request
+price_history_min = "1y" # shortest chart range the price store fetches (price_store)
+price_history_ttl = 86400 * 30 # stored histories are topped up daily, and dropped after going this long without an update
+
+http_timeout = (3.05, 30) # (connect, read) seconds for direct HTTP calls (sessions)
+http_retry_statuses = [429, 500, 502, 503, 504]
+http_pool_size = 20 # keep-alive connections per host
+http_pyex = True # route pyEX's REST calls through the pooled session too
+
+upstream_limits = { # provider -> (requests per second, burst) (throttle)
+    "iex": (50, 50),
+    "s3": (20, 20),
+    "default": (10, 10)
+}
+upstream_hosts = { # host suffix -> provider
+    "iexapis.com": "iex",
+    "amazonaws.com": "s3"
+}
+upstream_reserve = .5 # share of each bucket kept for user-facing calls - background calls wait below it
+upstream_retries = 3 # retries on connection errors and http_retry_statuses
+upstream_backoff = .5 # retry n sleeps up to upstream_backoff * 2 ** (n - 1) seconds, jittered
+upstream_backoff_max = 8
 
 cache_limit = 1048576 * 300 # modify second number for mb limit 
+cache_lock_stripes = 64 # number of locks the cache's symbol buckets are spread over
+cache_encode_threshold = 1048576 * 1 # entries at least this large (bytes) are stored compressed, None to disable
+cache_compression = "auto" # [auto, lz4, zstd, zlib, none] - auto picks the first one installed
+cache_keep_decoded = ["trade_table"] # cached functions held decoded in memory whatever their size (read on every request) - still encoded in the tiers
+cache_backend = None # [None, redis, local] - cache tier shared across worker processes ("local" is an in-process stand-in)
+cache_backend_url = "redis://localhost:6379/0"
+cache_backend_secret = None # key the shared cache signs its entries with (HMAC-SHA256) - defaults to the SIGMA7_CACHE_SECRET environment variable
+cache_disk_path = None # SQLite file for the persistent cache tier, e.g. os.path.join(tempfile.gettempdir(), "sigma7.sqlite")
 cache_time_limit = 86400 * (1.25)
+market_tz = "America/New_York"
+peer_stale_after = 86400 # serve peer comparisons stale and refresh in the background after a day
+peer_graph_ttl = 86400 * 7 # how long a symbol's peers are kept (peer_graph)
+ceo_comp_ttl = 86400 * 30 # compensation is reported yearly
+ceo_comp_stale_after = 86400 * 7
+company_ttl = 86400 * 7
+econ_refresh_hour = 9 # econ series expire daily at this hour (market_tz)
+cache_sweeper = False # start the background sweeper when sigma7.dec_cache is imported
+cache_sweep_interval = 60 * 5 # seconds between sweeps
+cache_stats_interval = None # seconds between logged cache_stats snapshots, None to disable
+cache_latency_buckets = [.01, .05, .1, .25, .5, 1, 2.5, 5, 10, 30] # miss latency histogram bounds (seconds)
 
 political_trades = {
     "senate": "https://senate-stock-watcher-data.s3-us-west-2.amazonaws.com/aggregate/all_transactions.json",
     "house": "https://house-stock-watcher-data.s3-us-west-2.amazonaws.com/data/all_transactions.json"
-}
\ No newline at end of file
+}
+political_trades_ttl = 3600 * 6 # seconds between (conditional) checks of the feeds for new trades (political)
+political_trades_keep = 86400 * 7 # seconds the trade table stays cached - the base of the conditional checks (political)
\ No newline at end of file
@@ -0,0 +1,144 @@
+""" shared_cache - cache tier shared by every sigma7 worker on a host
+
+Entries are written to a Redis-protocol server in their encoded form (see codec), so
+one worker's upstream fetch serves every other worker. Encoded values are pickles, so
+every value is signed with HMAC-SHA256 under cache_backend_secret and values that are
+unsigned or fail verification are treated as misses - a client that can write to the
+server cannot get code run on the workers. LocalRedis is an in-process stand-in with
+the same interface, used in tests and single-process setups.
+"""
+
+import hmac
+from hashlib import sha256
+from fnmatch import fnmatchcase
+from json import dumps, loads
+from logging import warning
+from os import environ
+from threading import Lock
+from time import time
+from .codec import Encoded
+from .settings import cache_backend_secret
+
+class LocalRedis:
+    """In-process stand-in for the subset of the redis-py client RedisCache uses."""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = Lock()
+
+    def get(self, name: str) -> bytes:
+        with self.lock:
+            item = self.data.get(name)
+            if item is None: return None
+            value, expires = item
+            if expires is not None and expires <= time():
+                del self.data[name]
+                return None
+            return value
+
+    def set(self, name: str, value: bytes, px: int = None) -> bool:
+        with self.lock:
+            self.data[name] = (value, time() + px / 1000 if px else None)
+        return True
+
+    def delete(self, *names) -> int:
+        with self.lock:
+            return sum(self.data.pop(name, None) is not None for name in names)
+
+    def scan_iter(self, match: str = "*"):
+        with self.lock:
+            names = [name for name in self.data.keys() if fnmatchcase(name, match)]
+        return iter(names)
+
+class RedisCache:
+    """Cache tier backed by a Redis-protocol server.
+
+    The server expires entries itself, so purge is a no-op. Values are stored as
+    signature + JSON header + newline + encoded data, signed together with their key.
+
+    Args:
+        client (object): redis.Redis client, or a LocalRedis
+        prefix (str): Prefix for every key written - defaults to "sigma7"
+        secret (str | bytes): Key to sign entries with - defaults to cache_backend_secret, then SIGMA7_CACHE_SECRET
+    """
+
+    def __init__(self, client, prefix: str = "sigma7", secret = None):
+        if secret is None: secret = cache_backend_secret or environ.get("SIGMA7_CACHE_SECRET")
+        if not secret: raise ValueError("The shared cache needs a secret to sign entries with - set cache_backend_secret or SIGMA7_CACHE_SECRET")
+        self.client = client
+        self.prefix = prefix
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "sigma7", secret = None):
+        """Connects to a server, e.g. redis://localhost:6379/0 (requires the redis package)."""
+        try:
+            from redis import Redis
+        except ImportError:
+            raise ImportError("The shared cache needs the redis package - pip install sigma7[shared]")
+        return cls(Redis.from_url(url), prefix, secret)
+
+    def _name(self, platform: str, key: str, func: str) -> str:
+        return f"{self.prefix}:{platform}:{key}:{func}"
+
+    def _sign(self, name: str, body: bytes) -> bytes:
+        return hmac.new(self.secret, name.encode() + b"\n" + body, sha256).digest()
+
+    def get(self, platform: str, key: str, func: str) -> tuple:
+        """Returns an unexpired entry and its metadata.
+
+        Returns:
+            tuple: (Encoded, meta) - (None, None) if there is no valid entry
+        """
+        name = self._name(platform, key, func)
+        raw = self.client.get(name)
+        if raw is None: return None, None
+        mac, body = raw[:sha256().digest_size], raw[sha256().digest_size:]
+        if not hmac.compare_digest(mac, self._sign(name, body)):
+            warning(f"Ignoring {name} - its signature does not match")
+            return None, None
+        header, data = body.split(b"\n", 1)
+        meta = loads(header)
+        if meta["expires"] <= time(): return None, None
+        compression, version = meta.pop("compression"), meta.pop("version", 0)
+        return Encoded(data, compression, version), meta
+
+    def set(self, platform: str, key: str, func: str, encoded: Encoded, meta: dict) -> bool:
+        """Writes an entry, replacing any previous entry with the same key.
+
+        Returns:
+            bool: Whether the operation was successful
+        """
+        ttl = int((meta["expires"] - time()) * 1000)
+        if ttl <= 0: return False
+        header = {"ts": meta["ts"], "expires": meta["expires"], "name": meta["name"], "compression": encoded.compression, "version": encoded.version}
+        name = self._name(platform, key, func)
+        body = dumps(header).encode() + b"\n" + encoded.data
+        self.client.set(name, self._sign(name, body) + body, px=ttl)
+        return True
+
+    def delete(self, platform: str, key: str, func: str) -> bool:
+        """Deletes an entry.
+
+        Returns:
+            bool: Whether an entry was deleted
+        """
+        return self.client.delete(self._name(platform, key, func)) > 0
+
+    def purge(self) -> int:
+        """Expired entries are dropped by the server.
+
+        Returns:
+            int: Always 0
+        """
+        return 0
+
+    def clear(self) -> bool:
+        """Deletes every entry under this tier's prefix.
+
+        Returns:
+            bool: Whether the operation was successful
+        """
+        names = list(self.client.scan_iter(match=f"{self.prefix}:*"))
+        if names: self.client.delete(*names)
+        return True
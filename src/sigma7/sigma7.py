@@ -1,49 +1,55 @@
 """ Analytical functions derived from data internal to sigma7 and or not from one of our typical vendors.
 """
 
-from json import loads
-from requests import get
 from copy import deepcopy
+from datetime import date, timedelta
 from statistics import mean
-from sigma7.settings import political_trades
+import numpy as np
+import pandas as pd
+from sigma7.settings import political_trades, political_trades_ttl
 from sigma7.dec_cache import cache
-from sigma7.utils import date_to_ts, parse_dates, within_date_range, parse_amount, unique_list_append
+from sigma7.political import trade_table
+from sigma7.utils import date_to_ts, unique_list_append
 
-@cache(platform = "sigma7", _key = "misc")
+# normalized transaction types counted as buying/selling
+BOUGHT = ["purchase", "exchange"]
+SOLD = ["sale_partial", "sale_full"]
+
+@cache(platform = "sigma7", _key = "misc", ttl = political_trades_ttl)
 def pull_political_trades(merge: bool=True, sort: bool=True) -> dict:
     """Pulls trades of politicians.
 
-    This will ultimately be saved in a container somewhere in azure.
+    Trades come from the political trades table (see political), which streams and
+    normalizes the House and Senate feeds.
 
     Args:
         merge (bool): Whether or not to merge house/senate political transactions. Defaults to True
-        sort (bool): Whether or not to sort transactions by disclosure date. Defaults to True
+        sort (bool): Kept for compatibility - transactions are always sorted by disclosure date, newest first
 
     Returns:
         dict: dictionary containing political trades 
     """
-
-    for trades in political_trades.items():
-        group, ep = trades
-        raw = loads(get(ep).text)
-        out = {}
-        if merge:
-            out = {"transactions": []}
-            for trade in raw:
-                _date = parse_dates(trade["disclosure_date"])
-                trade["date"] = _date
-                trade["timestamp"] = date_to_ts(_date)
-                out["transactions"].append(trade)
-            if sort:
-                out["transactions"] = list(sorted(out["transactions"], key=lambda x: x["timestamp"], reverse=True))
-        else:
-            out["transactions"][group] = raw 
+    table = trade_table()
+    if merge: return {"transactions": table.rows()}
+    chambers = table.take("chamber")
+    out = {"transactions": {}}
+    for group in political_trades.keys():
+        out["transactions"][group] = table.rows(np.flatnonzero(chambers == group))
     return out
 
-@cache(platform = "sigma7")
+def symbol_trades(symbol: str, lastN: int) -> tuple:
+    """Returns the trade table and the row ids of a symbol's trades disclosed in the last lastN months (30 days each), newest first."""
+    table = trade_table()
+    start = date_to_ts(str(date.today() - timedelta(lastN * 30)))
+    return table, table.query(symbol, start)
+
+@cache(platform = "sigma7", ttl = political_trades_ttl)
 def search_political_trades(symbol: str, lastN: int=6) -> dict:
     """Search insider transactions by symbol
 
+    Looks the symbol up in the trade table's ticker index, so only its trades in the
+    window are touched.
+
     Args:
         symbol (str): Supported IEX symbol
         lastN (int): Number of months (backwards) to search - defaults to 6
@@ -54,18 +60,11 @@ def search_political_trades(symbol: str, lastN: int=6) -> dict:
     out = {
         "symbol": symbol
     }
-    transactions = []
-    trades = pull_political_trades(merge = True, sort = True)["transactions"]
-    for trade in trades:
-        if symbol == trade["ticker"]:
-            _date = parse_dates(trade["disclosure_date"])
-            if within_date_range(_date, lastN):
-                trade["disclosure_date"] = _date
-                transactions.append(trade)
-    out["transactions"] = transactions
+    table, rows = symbol_trades(symbol, lastN)
+    out["transactions"] = table.rows(rows)
     return out
 
-@cache(platform = "sigma7")
+@cache(platform = "sigma7", ttl = political_trades_ttl)
 def political_pie(symbol: str, lastN: int = 6) -> dict:
     """Returns the ratio of buys/sells from politicians for a given symbol.
 
@@ -89,16 +88,13 @@ def political_pie(symbol: str, lastN: int = 6) -> dict:
             }
         }
     } 
-    trades = search_political_trades(symbol = symbol, lastN = lastN)["transactions"]
-    trans = {"sale_partial": "sold", "sale_full": "sold", "purchase": "bought", "exchange": "bought"}
-    for trade in trades:
-        ra = trade["amount"]
-        amt = parse_amount(ra)
-        _type = trans[trade["type"]]
-        out["data"][_type]["est_volume"] += amt
+    table, rows = symbol_trades(symbol, lastN)
+    types, amounts = table.take("type", rows), table.take("amount_mid", rows)
+    out["data"]["bought"]["est_volume"] = int(amounts[np.isin(types, BOUGHT)].sum())
+    out["data"]["sold"]["est_volume"] = int(amounts[np.isin(types, SOLD)].sum())
     return out
 
-@cache(platform = "sigma7")
+@cache(platform = "sigma7", ttl = political_trades_ttl)
 def politician_transactions(symbol: str, rollingN: int=4) -> dict:
     """Returns the time-series transactions of trades from politicians on a given symbol
 
@@ -117,20 +113,17 @@ def politician_transactions(symbol: str, rollingN: int=4) -> dict:
     trans = {"sale_partial": "sale_volume", "sale_full": "sale_volume", "purchase": "purchase_volume", "exchange": "purchase_volume"}
     trans_loc = {"sale_partial": sale_vol, "sale_full": sale_vol, "purchase": purch_vol, "exchange": purch_vol}
     _trans_loc = {"sale_partial": purch_vol, "sale_full": purch_vol, "purchase": sale_vol, "exchange": sale_vol}
-    trades = search_political_trades(symbol = symbol, lastN = 36)["transactions"]
-    print(len(trades))
-    for trade in trades:
-        _date = trade["disclosure_date"]
-        amt = parse_amount(trade["amount"])
+    table, rows = symbol_trades(symbol, 36)
+    trades = zip(*[table.take(field, rows).tolist() for field in ["date", "type", "amount_mid", "representative"]])
+    for _date, _type, amt, rep in trades:
         if _date not in out["transactions"].keys():
             _out = deepcopy(tp)
         else: _out = out["transactions"][_date]
         if not _out["date"]: _out["date"] = _date
-        _type = trans[trade["type"]]
-        trans_loc[trade["type"]].append(amt)
-        _trans_loc[trade["type"]].append(0)
+        trans_loc[_type].append(amt)
+        _trans_loc[_type].append(0)
         total_vol.append(amt)
-        _out[_type] += amt
+        _out[trans[_type]] += amt
         _out["total_volume"] += amt
         if len(total_vol) >= 4:
             _out["rolling_purchase_vol"] = mean(purch_vol[-rollingN:])
@@ -140,12 +133,12 @@ def politician_transactions(symbol: str, rollingN: int=4) -> dict:
             _out["rolling_purchase_vol"] = 0
             _out["rolling_sale_vol"] = 0
             _out["rolling_total_vol"] = 0
-        _out["reps"] = unique_list_append(_out["reps"], trade["representative"])
+        _out["reps"] = unique_list_append(_out["reps"], rep)
         out["transactions"][_date] = _out
     out["transactions"] = list(out["transactions"].values())[3:]
     return out
 
-@cache(platform = "sigma7")
+@cache(platform = "sigma7", ttl = political_trades_ttl)
 def top_political_traders(symbol: str) -> dict:
     """Returns the top political traders of a given stock by volume
         over the last 18 months.
@@ -156,34 +149,27 @@ def top_political_traders(symbol: str) -> dict:
         dict: Top N political insiders ordered least to greatest by volume
     """
     
-    trades = search_political_trades(symbol = symbol, lastN = 18)["transactions"]
-    insider = {"est_sale_volume": 0, "est_purchase_volume": 0, "est_volume": 0, "district": False}
-    trans = {"sale_partial": "est_sale_volume", "sale_full": "est_sale_volume", "purchase": "est_purchase_volume", "exchange": "est_purchase_volume"}
-    insiders = {}
-    for trade in trades:
-        name = trade["representative"]
-        amt = parse_amount(trade["amount"])
-        district = trade["district"]
-        if name in insiders.keys():
-            _insider = insiders[name]
-        else: _insider = insider.copy()
-        _insider["name"] = name
-        _type = trans[trade["type"]]
-        _insider[_type] += amt
-        _insider["est_volume"] += amt
-        if not _insider["district"] and district: 
-            _insider["district"] = district
-            _insider["state"] = district[0:2]
-        insiders[name] = _insider
-    insiders = dict(sorted(insiders.items(), key=lambda x: x[1]["est_volume"], reverse=True))
-    insiders = list(insiders.values())
+    table, rows = symbol_trades(symbol, 18)
+    types, amounts = table.take("type", rows), table.take("amount_mid", rows)
+    codes, names = pd.factorize(table.take("representative", rows), use_na_sentinel = False)
+    purchases = np.bincount(codes, weights = np.where(np.isin(types, BOUGHT), amounts, 0), minlength = len(names)).astype(np.int64)
+    sales = np.bincount(codes, weights = np.where(np.isin(types, SOLD), amounts, 0), minlength = len(names)).astype(np.int64)
+    districts = {}
+    for code, district in zip(codes.tolist(), table.take("district", rows).tolist()):
+        if district and code not in districts: districts[code] = district
+    insiders = list()
+    for code in np.argsort(-(sales + purchases), kind = "stable").tolist():
+        _insider = {"est_sale_volume": int(sales[code]), "est_purchase_volume": int(purchases[code]), "est_volume": int(sales[code] + purchases[code]), "district": False, "name": names[code]}
+        if code in districts:
+            _insider["district"] = districts[code]
+            _insider["state"] = districts[code][0:2]
+        insiders.append(_insider)
     out = {
         "symbol": symbol,
         "transactions": insiders
     }
     return out
 
-
     
 
 
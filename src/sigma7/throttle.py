@@ -0,0 +1,156 @@
+""" throttle - rate limits and retries for every upstream call
+
+Each provider (IEX, the S3 political-trades buckets, anything else) gets a token
+bucket refilled at upstream_limits[provider] requests per second. Every request,
+retries included, takes a token first, so bursts of peer fan-outs are smoothed out
+instead of running into 429s. Background traffic (cache refreshes, warmups - see
+background) only takes a token while more than upstream_reserve of the bucket is
+left, so user-facing calls are served first when the budget is tight.
+
+Failed requests (connection errors, 429 and 5xx) are retried up to upstream_retries
+times, sleeping a random time up to upstream_backoff * 2 ** attempt seconds (full
+jitter), or whatever Retry-After asks for.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from random import uniform
+from threading import Lock
+from time import monotonic, sleep
+from urllib.parse import urlparse
+import requests
+from .settings import upstream_limits, upstream_hosts, upstream_reserve, upstream_retries, upstream_backoff, upstream_backoff_max, http_retry_statuses
+
+# priority of the calls made in the current context [user, background]
+PRIORITY = ContextVar("sigma7_priority", default="user")
+
+# provider -> TokenBucket
+BUCKETS = {}
+BUCKETS_LOCK = Lock()
+
+class TokenBucket:
+    """Token bucket allowing rate requests per second on average, and bursts of up to burst.
+
+    Args:
+        rate (float): Tokens added per second
+        burst (float): Most tokens the bucket holds
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = monotonic()
+        self.lock = Lock()
+
+    def take(self, priority: str = "user") -> float:
+        """Takes a token if one is available for the priority.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one should be
+        """
+        floor = self.burst * upstream_reserve if priority == "background" else 0
+        with self.lock:
+            now = monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens - floor >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 + floor - self.tokens) / self.rate
+
+def provider_of(url: str) -> str:
+    """Returns the provider a URL belongs to, by host (see upstream_hosts)."""
+    host = urlparse(url).hostname or ""
+    for suffix, provider in upstream_hosts.items():
+        if host.endswith(suffix): return provider
+    return "default"
+
+def bucket(provider: str) -> TokenBucket:
+    """Returns the token bucket of a provider, creating it on first use."""
+    with BUCKETS_LOCK:
+        if provider not in BUCKETS:
+            rate, burst = upstream_limits.get(provider, upstream_limits["default"])
+            BUCKETS[provider] = TokenBucket(rate, burst)
+        return BUCKETS[provider]
+
+@contextmanager
+def background():
+    """Marks the upstream calls made inside the block (and tasks it starts) as background traffic."""
+    token = PRIORITY.set("background")
+    try:
+        yield
+    finally:
+        PRIORITY.reset(token)
+
+def acquire(provider: str):
+    """Blocks until the provider's bucket hands out a token."""
+    _bucket = bucket(provider)
+    while True:
+        wait = _bucket.take(PRIORITY.get())
+        if not wait: return
+        sleep(wait)
+
+async def acquire_async(provider: str):
+    """asyncio version of acquire."""
+    _bucket = bucket(provider)
+    while True:
+        wait = _bucket.take(PRIORITY.get())
+        if not wait: return
+        await asyncio.sleep(wait)
+
+def backoff(attempt: int, retry_after: str = None) -> float:
+    """Seconds to wait before retry number attempt + 1 - Retry-After if given, else full jitter."""
+    if retry_after:
+        try:
+            return min(float(retry_after), upstream_backoff_max)
+        except ValueError:
+            pass
+    return uniform(0, min(upstream_backoff_max, upstream_backoff * 2 ** attempt))
+
+def call(provider: str, send, retries: int = None) -> requests.Response:
+    """Sends a request through the provider's rate limit, retrying failures.
+
+    Args:
+        provider (str): Provider to rate limit against
+        send (function): Zero argument function returning a requests.Response
+        retries (int): Most retries - defaults to upstream_retries
+
+    Returns:
+        requests.Response: The first response that is not retryable, or the last one - retried responses are closed
+    """
+    if retries is None: retries = upstream_retries
+    for attempt in range(retries + 1):
+        acquire(provider)
+        try:
+            resp = send()
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries: raise
+            sleep(backoff(attempt))
+            continue
+        if resp.status_code not in http_retry_statuses or attempt == retries: return resp
+        resp.close()
+        sleep(backoff(attempt, resp.headers.get("Retry-After")))
+
+async def call_async(provider: str, send, errors: tuple = (OSError, asyncio.TimeoutError)) -> tuple:
+    """asyncio version of call.
+
+    Args:
+        provider (str): Provider to rate limit against
+        send (function): Zero argument coroutine function returning (status, headers, body)
+        errors (tuple): Exceptions send raises on connection failures
+
+    Returns:
+        tuple: (status, headers, body) of the first response that is not retryable, or the last one
+    """
+    for attempt in range(upstream_retries + 1):
+        await acquire_async(provider)
+        try:
+            status, headers, body = await send()
+        except errors:
+            if attempt == upstream_retries: raise
+            await asyncio.sleep(backoff(attempt))
+            continue
+        if status not in http_retry_statuses or attempt == upstream_retries: return status, headers, body
+        await asyncio.sleep(backoff(attempt, headers.get("Retry-After")))
@@ -7,18 +7,23 @@ They will be further documented later..
 from datetime import datetime  
 import pandas as pd
 from pandas import Timestamp
-from numpy import int64, int32, float64, bool_
+from numpy import int64, int32, float64, bool_, ndarray
 from azure.ai.textanalytics import TextAnalyticsClient
 from azure.core.credentials import AzureKeyCredential
 from os import environ
 from datetime import date, timedelta
 from .settings import comp_fields
-from pyEX import chartDF
 from numpy import sqrt, log1p
-from statistics import median
+from statistics import median, mean
+from math import ceil
+from scipy.stats import trim_mean
 from logging import info
 from sys import getsizeof
 from time import mktime
+from inspect import Signature, Parameter
+from hashlib import sha1
+from json import dumps
+from copy import deepcopy
 
 def log(_info: str):
     print(_info)
@@ -83,7 +88,11 @@ def authenticate_client() -> object:
     return text_analytics_client
 
 def sharpe_ratio(symbol: str, N:int, rf: float=0):
-    prices = chartDF(symbol, timeframe=f"{N}y", sort="asc") 
+    from .price_store import price_history
+    prices = price_history(symbol, f"{N}y")
+    return sharpe_stats(prices, rf)
+
+def sharpe_stats(prices: pd.DataFrame, rf: float=0) -> dict:
     r = prices["changePercent"].mean()
     if rf > 0: r = r - rf
     std = prices["changePercent"].std()
@@ -94,6 +103,116 @@ def sharpe_ratio(symbol: str, N:int, rf: float=0):
         "std": round(std, 4)
     }
 
+def peer_comparison(symbol: str, og_stat: float, peer_data: dict) -> dict:
+    """Compares a symbol's stat with the same stat of its peers.
+
+    The baseline is the trimmed or plain peer mean, whichever is closer to the symbol's stat.
+    With fewer than three peers nothing is trimmed.
+
+    Args:
+        symbol (str): Symbol being compared
+        og_stat (float): The symbol's stat
+        peer_data (dict): Peer symbols mapped to their (rounded) stat
+
+    Returns:
+        dict: The compareStat output - peer_metrics includes the symbol, as it always has.
+            Without any peer data, the peer averages are None
+    """
+    if not peer_data:
+        return {"symbol": symbol, "average": og_stat, "peerAvg": None,
+                "peers": [], "peer_metrics": {symbol: og_stat},
+                "output": {symbol: og_stat},
+                "meta": {"trimmed_meta": None, "trimmedAvg": None, "realPeerAvg": None}
+            }
+    peersOf = list(peer_data.keys())
+    stats = list(peer_data.values())
+    # trim_mean needs a proportion under half - one or two peers are not trimmed
+    trim = ceil(100/len(peersOf)) if len(peersOf) > 2 else 0
+    trimmedAvg = trim_mean(stats, trim/100)
+    peerAvg = mean(stats)
+    if (trimmedAvg - og_stat) < (peerAvg - og_stat):
+        out_stat = trimmedAvg
+    else:
+        out_stat = peerAvg
+    peer_metrics = dict(peer_data)
+    peer_metrics[symbol] = og_stat
+    output = dict(sorted(peer_metrics.items(), key=lambda x: x[1], reverse=True)) 
+    return {"symbol": symbol, "average": og_stat, "peerAvg": out_stat, 
+            "peers": peersOf, "peer_metrics": peer_metrics,
+            "output": output,
+             "meta": {
+                 "trimmed_meta": f"Trimmed Mean - {trim}%",
+                 "trimmedAvg": trimmedAvg, "realPeerAvg": peerAvg 
+                }
+        }
+
+def peer_comparisons(symbol: str, og_stats: dict, peer_stats: dict, stats: list) -> dict:
+    """Compares several stats of a symbol with its peers, from their keyStats documents.
+
+    Peer values are gathered for every stat in one pass over the peers, then each stat
+    is compared as in peer_comparison. Peers without a value for a stat are left out
+    of that stat's comparison.
+
+    Args:
+        symbol (str): Symbol being compared
+        og_stats (dict): The symbol's keyStats
+        peer_stats (dict): Peer symbols mapped to their keyStats
+        stats (list): Stats to compare
+
+    Returns:
+        dict: Each stat mapped to its compareStat output
+    """
+    peer_data = {stat: dict() for stat in stats}
+    for peer, doc in peer_stats.items():
+        for stat in stats:
+            val = doc.get(stat)
+            if val is not None: peer_data[stat][peer] = round(val, 2)
+    return {stat: peer_comparison(symbol, og_stats[stat], peer_data[stat]) for stat in stats}
+
+def total_return(symbol: str, frame: str, prices: pd.DataFrame, divs: pd.DataFrame) -> dict:
+    """Total return of a price series plus the dividends paid over it.
+
+    Args:
+        symbol (str): Symbol the data belongs to
+        frame (str): Period the data covers
+        prices (pd.DataFrame): Ascending prices with a close column
+        divs (pd.DataFrame): Dividends with an amount column
+
+    Returns:
+        dict: The full_returns output
+    """
+    prices = prices[["close"]]
+    if divs.empty: 
+        total_div = 0
+    else:
+        total_div = sum(divs["amount"].tolist())
+    start = prices.head(1).squeeze()
+    end = prices.tail(1).squeeze()
+    _total = (end - start) + total_div
+    per_return = round((_total/start) * 100, 2) 
+    return {
+        "symbol": symbol,
+        "frame": frame,
+        "return": round(_total, 2),
+        "percent_return": per_return
+    }
+
+def to_chart_df(chart: list) -> pd.DataFrame:
+    """chartDF from raw chart records - daily bars indexed by date, sorted ascending."""
+    df = pd.DataFrame(list(chart))
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"])
+        df = df.set_index("date").sort_index()
+    return df
+
+def to_dividends_df(divs: list) -> pd.DataFrame:
+    """dividendsBasicDF from raw dividend records - indexed by ex date."""
+    df = pd.DataFrame(list(divs))
+    if "exDate" in df.columns:
+        df["exDate"] = pd.to_datetime(df["exDate"])
+        df = df.set_index("exDate")
+    return df
+
 def _remove(x: object, y: list) -> list: 
     try: 
         y.remove(x)
@@ -201,12 +320,61 @@ def within_date_range(_date: str, lastN: int) -> bool:
     __date = date(int(_year), int(_mo), int(d))
     return __date >= start 
 
+def hash_arg(val: object) -> str:
+    """Returns a short, stable hash of a non-scalar argument.
+
+    Dicts are hashed independent of key order, and dataframes by their contents,
+    so equal arguments always produce the same hash across calls and processes.
+
+    Args:
+        val (object): Argument to hash
+
+    Returns:
+        str: 12 character hex digest
+    """
+    if isinstance(val, (pd.DataFrame, pd.Series)):
+        raw = pd.util.hash_pandas_object(val, index=True).values.tobytes()
+    else:
+        raw = dumps(val, sort_keys=True, default=str).encode()
+    return sha1(raw).hexdigest()[:12]
+
+def bind_args(sig: Signature, args: tuple, kwargs: dict) -> dict:
+    """Binds positional and keyword arguments to a function signature.
+
+    Defaults are filled in and extra keyword arguments (**kwargs) are flattened
+    in sorted order, so every spelling of the same call binds to the same dict.
+
+    Args:
+        sig (Signature): Signature of the function being called
+        args (tuple): Positional arguments
+        kwargs (dict): Keyword arguments
+
+    Returns:
+        dict: Argument names mapped to values in signature order
+    """
+    bound = sig.bind(*args, **kwargs)
+    bound.apply_defaults()
+    out = dict()
+    for name, val in bound.arguments.items():
+        kind = sig.parameters[name].kind
+        if kind == Parameter.VAR_KEYWORD:
+            for _name in sorted(val.keys()):
+                out[_name] = val[_name]
+        elif kind == Parameter.VAR_POSITIONAL:
+            for i, _val in enumerate(val):
+                out[f"{name}{i}"] = _val
+        else:
+            out[name] = val
+    return out
+
 def stringify_args(params: dict) -> str:
     out = list()
     for param in params.items():
         _key, val = param
-        if type(val) not in [dict, list]:
+        if isinstance(val, (str, int, float, bool)) or val is None:
             out.append(str(val))
+        else:
+            out.append(hash_arg(val))
     return "_".join(out)
 
 def parse_amount(amt: str) -> int:
@@ -243,7 +411,7 @@ def scan_cache(_cache: dict) -> dict:
             _out[func] = entries
             for __items in _vals.items():
                 __key, data = __items
-                _size += getsizeof(data)
+                _size += deep_getsizeof(data)
         out[_key] = _out
     out["size"] = _size
     return out
@@ -256,4 +424,94 @@ def date_to_ts(_date: str) -> int:
     __date = date(int(_year), int(_mo), int(d))
     tt = __date.timetuple()
     out = int(mktime(tt))
-    return out
\ No newline at end of file
+    return out
+
+def deep_getsizeof(o: object, seen: set = None) -> int:
+    """Returns the size of an object in bytes, including everything it references.
+
+    sys.getsizeof only counts the outer container, which undercounts nested dicts,
+    lists, and dataframes by orders of magnitude. Objects referenced more than once 
+    are only counted once.
+
+    Args:
+        o (object): Object to measure
+        seen (set): ids of objects already counted - used for recursion
+
+    Returns:
+        int: Size of the object in bytes
+    """
+    if seen is None: seen = set()
+    if id(o) in seen: return 0
+    seen.add(id(o))
+    if isinstance(o, pd.DataFrame):
+        return int(o.memory_usage(index=True, deep=True).sum())
+    if isinstance(o, pd.Series):
+        return int(o.memory_usage(index=True, deep=True))
+    if isinstance(o, ndarray):
+        return max(getsizeof(o), o.nbytes)
+    _size = getsizeof(o)
+    if isinstance(o, dict):
+        for item in o.items():
+            _key, val = item
+            _size += deep_getsizeof(_key, seen) + deep_getsizeof(val, seen)
+    elif isinstance(o, (list, tuple, set, frozenset)):
+        for val in o:
+            _size += deep_getsizeof(val, seen)
+    return _size
+
+class FrozenDict(dict):
+    """Read-only dict used for values shared out of the sigma7 cache.
+
+    It is still a dict (so json.dumps and isinstance checks keep working), but every
+    mutating method raises TypeError. copy() and deepcopy() return plain, mutable dicts.
+    """
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Cached values are read-only - copy() them before modifying.")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def copy(self) -> dict:
+        return dict(self)
+
+    def __deepcopy__(self, memo: dict) -> dict:
+        return {_key: deepcopy(val, memo) for _key, val in self.items()}
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+def _freeze_buffer(values: object):
+    if isinstance(values, ndarray):
+        base = values
+        while isinstance(base.base, ndarray): base = base.base
+        base.setflags(write=False)
+        values.setflags(write=False)
+
+def freeze(o: object) -> object:
+    """Returns a read-only version of an object so it can be shared without copies.
+
+    Dicts become FrozenDicts and lists become tuples (recursively). NumPy arrays and 
+    the buffers behind DataFrames/Series are marked read-only, so in place writes raise.
+
+    Args:
+        o (object): Object to freeze
+
+    Returns:
+        object: Frozen object
+    """
+    if isinstance(o, FrozenDict):
+        return o
+    if isinstance(o, dict):
+        return FrozenDict((_key, freeze(val)) for _key, val in o.items())
+    if isinstance(o, (list, tuple)):
+        return tuple(freeze(val) for val in o)
+    if isinstance(o, set):
+        return frozenset(o)
+    if isinstance(o, ndarray):
+        _freeze_buffer(o)
+    elif isinstance(o, pd.DataFrame):
+        for i in range(o.shape[1]):
+            _freeze_buffer(o.iloc[:, i].to_numpy(copy=False))
+    elif isinstance(o, pd.Series):
+        _freeze_buffer(o.to_numpy(copy=False))
+    return o
@@ -3,38 +3,60 @@
 The functions contained in this module support the wrapper/decorators in other modules. In particular, decor and dec_cache.
 """
 
-from pyEX import analystRecommendations, balanceSheet, cashFlow, ceoCompensation, incomeStatement, dividendsBasic, chart, news
 from logging import warning
 import functools
+from .providers import fetch
 
+def analyst_recs(symbol: str) -> list:
+    return fetch(f"stock/{symbol}/recommendation-trends")
+
+def statement(path: str, key: str):
+    """Route for a financial statement - pyEX returns the list under key rather than the whole document."""
+    def route(symbol: str, period: str = "quarter", last: int = 1) -> list:
+        return fetch(f"stock/{symbol}/{path}", period=period, last=last).get(key, [])
+    return route
+
+def ceo_pay(symbol: str) -> dict:
+    return fetch(f"stock/{symbol}/ceo-compensation")
+
+def dividends(symbol: str, timeframe: str = "ytd") -> list:
+    return fetch(f"stock/{symbol}/dividends/{timeframe}")
+
+def prices(symbol: str, timeframe: str = "1m", sort: str = "desc") -> list:
+    return fetch(f"stock/{symbol}/chart/{timeframe}", sort=sort)
+
+def news(symbol: str, count: int = 10) -> list:
+    return fetch(f"stock/{symbol}/news/last/{count}")
+
+# routes fetch through the current data provider (see providers), with pyEX's paths and defaults
 func_routes = {
     "iex": {
         "analyst_recs": {
-            "func": analystRecommendations,
+            "func": analyst_recs,
             "params": {}
         },
         "balance_sheet": {
-            "func": balanceSheet,
+            "func": statement("balance-sheet", "balancesheet"),
             "params": {}
         }, 
         "cash_flow": {
-            "func": cashFlow,
+            "func": statement("cash-flow", "cashflow"),
             "params": {}
         },
         "ceo_pay": {
-            "func": ceoCompensation,
+            "func": ceo_pay,
             "params": {}
         },
         "income_statement": {
-            "func": incomeStatement,
+            "func": statement("income", "income"),
             "params": {}
         }, 
         "dividends": {
-            "func": dividendsBasic,
+            "func": dividends,
             "params": {}
         },
         "prices": {
-            "func": chart,
+            "func": prices,
             "params": {"sort": "asc"}
         },
         "news": {
@@ -0,0 +1,137 @@
+"""
+test_aio_iex.py
+"""
+
+import pytest
+import asyncio
+from os import environ
+import sigma7.aio_iex as aio
+import sigma7.iex_funcs as iex
+import sigma7.dec_cache as dc
+import sigma7.peer_graph as pg
+import sigma7.sessions as sessions
+from sigma7.settings import http_timeout
+from sigma7.utils import peer_comparison
+from sigma7.throttle import PRIORITY, background
+
+PEERS = ["AAPL", "GOOGL", "AMZN", "ORCL"]
+STATS = {"MSFT": 2.0, "AAPL": 2.5, "GOOGL": 1.5, "AMZN": 1.7, "ORCL": .3}
+
+@pytest.fixture
+def fake_iex(monkeypatch):
+    environ.setdefault("IEX_TOKEN", "test")
+    state = {"active": 0, "peak": 0, "calls": []}
+
+    def payload(symbol: str, kind: str):
+        if kind == "peers": return PEERS
+        if kind == "stats": return {"beta": STATS[symbol], "peRatio": STATS[symbol] * 10 if symbol != "AMZN" else None, "dividendYield": .01 if symbol == "MSFT" else None}
+        raise aio.PyEXception("Response 404 - ")
+
+    async def iex_get(path: str, **params):
+        state["calls"].append((path, params))
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(.01)
+        state["active"] -= 1
+        if path == "stock/market/batch":
+            return {symbol: {kind: payload(symbol, kind) for kind in params["types"].split(",")} for symbol in params["symbols"].split(",")}
+        _, symbol, kind = path.split("/")[:3]
+        return payload(symbol, kind)
+
+    monkeypatch.setattr(aio, "iex_get", iex_get)
+    dc.flush_cache()
+    pg.clear_peers()
+    yield state
+    dc.flush_cache()
+    pg.clear_peers()
+
+def test_compare_stat_fans_out(fake_iex):
+    out = iex.compareStat("MSFT", "beta")
+    assert out["average"] == 2.0
+    assert out["peers"] == tuple(PEERS)
+    assert list(out["output"].keys())[0] == "AAPL"
+    assert out["peer_metrics"]["MSFT"] == 2.0
+    assert len(fake_iex["calls"]) == 2
+    assert fake_iex["calls"][1][1]["symbols"] == "MSFT," + ",".join(PEERS)
+    assert iex.compareStat(symbol = "MSFT", stat = "beta") is out
+
+def test_prefetch_batches(fake_iex, monkeypatch):
+    monkeypatch.setattr(aio, "iex_batch_size", 2)
+    symbols = ["MSFT", *PEERS]
+    asyncio.run(aio.prefetch(symbols[:2], ["stats"]))
+    out = asyncio.run(aio.prefetch(symbols, ["stats", "peers"]))
+    assert out["ORCL"]["stats"]["beta"] == .3
+    assert out["MSFT"]["peers"] == tuple(PEERS)
+    batches = [params for _, params in fake_iex["calls"]]
+    assert batches[0] == {"symbols": "MSFT,AAPL", "types": "stats"}
+    assert {"symbols": "MSFT,AAPL", "types": "peers"} in batches
+    assert {"symbols": "GOOGL,AMZN", "types": "stats,peers"} in batches
+    assert {"symbols": "ORCL", "types": "stats,peers"} in batches
+    assert fake_iex["peak"] > 1
+    asyncio.run(aio.prefetch(symbols, ["stats", "peers"]))
+    assert len(batches) == len(fake_iex["calls"]) == 4
+
+def test_compare_stats_one_fetch(fake_iex):
+    out = iex.compare_stats("MSFT", ["beta", "peRatio"])
+    assert len(fake_iex["calls"]) == 2
+    assert out["beta"] == iex.compareStat("MSFT", "beta")
+    assert out["peRatio"]["average"] == 20.0
+    assert "AMZN" not in out["peRatio"]["peer_metrics"]
+    assert len(fake_iex["calls"]) == 2
+
+def test_compare_stat_reads_compare_stats(fake_iex, monkeypatch):
+    assert iex.compareStat("MSFT", "beta")["average"] == 2.0
+    monkeypatch.setitem(STATS, "MSFT", 5.0)
+    for entry in list(dc.CACHE["entries"].keys()):
+        if entry[2].startswith(("compare_stats_", "batch_stats")): dc.pop_cache(*entry)
+    assert iex.compareStat("MSFT", "beta")["average"] == 5.0
+
+def test_compare_stats_without_peer_values(fake_iex):
+    out = iex.compare_stats("MSFT", ["beta", "dividendYield"])
+    assert out["beta"]["average"] == 2.0
+    assert out["dividendYield"]["peerAvg"] is None
+    assert out["dividendYield"]["peer_metrics"] == {"MSFT": .01}
+
+def test_peer_comparison_few_peers():
+    out = peer_comparison("MSFT", 2.0, {"AAPL": 2.5})
+    assert out["peerAvg"] == 2.5 and out["meta"]["trimmedAvg"] == 2.5
+    out = peer_comparison("MSFT", 2.0, {"AAPL": 2.5, "ORCL": .3})
+    assert out["meta"]["realPeerAvg"] == out["meta"]["trimmedAvg"] == 1.4
+
+def test_run_sync_inside_loop(fake_iex):
+    async def handler():
+        return aio.run_sync(aio.compareStat_async, "MSFT", "beta")
+    assert asyncio.run(handler())["symbol"] == "MSFT"
+
+def test_peer_graph_shared(fake_iex):
+    iex.compareStat("MSFT", "beta")
+    for symbol in ["MSFT", *PEERS]:
+        dc.pop_cache(*aio.batch_entry(symbol, "stats"))
+    asyncio.run(aio.compareStat_async("MSFT", "beta"))
+    assert [params.get("types") for _, params in fake_iex["calls"]] == ["peers", "stats", "stats"]
+    assert pg.symbols_with_peer("ORCL") == {"MSFT"}
+    assert dc.lookup_cache(*pg.peer_entry("MSFT"))[1]["expires"] > dc.time() + pg.peer_graph_ttl - 60
+    pg.store_peers("MSFT", ["AAPL"])
+    assert pg.symbols_with_peer("ORCL") == frozenset()
+    assert pg.symbols_with_peer("AAPL") == {"MSFT"}
+    dc.flush_cache()
+    assert pg.lookup_peers("MSFT") is None and pg.symbols_with_peer("AAPL") == frozenset()
+
+def test_peer_groups_deduplicated(fake_iex):
+    PEERS_OF = {"MSFT": ["AAPL", "GOOGL"], "AAPL": ["MSFT", "GOOGL"]}
+    async def iex_get(path: str, **params):
+        fake_iex["calls"].append((path, params))
+        return {symbol: {kind: PEERS_OF[symbol] if kind == "peers" else {"beta": STATS[symbol]} for kind in params["types"].split(",")} for symbol in params["symbols"].split(",")}
+    aio.iex_get = iex_get
+    out = asyncio.run(aio.prefetch_peer_groups(["MSFT", "AAPL"], ["stats"]))
+    assert sorted(out.keys()) == ["AAPL", "GOOGL", "MSFT"]
+    assert [params["symbols"] for _, params in fake_iex["calls"]] == ["MSFT,AAPL", "MSFT,AAPL,GOOGL"]
+
+def test_run_sync_reuses_loop(fake_iex):
+    async def session():
+        return await sessions.get_aio_session()
+    first, second = aio.run_sync(session), aio.run_sync(session)
+    assert first[0] is second[0] and not first[0].closed
+    assert first[0].timeout.sock_read == http_timeout[1]
+    with background():
+        assert aio.run_sync(lambda: asyncio.sleep(0, PRIORITY.get())) == "background"
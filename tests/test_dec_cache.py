@@ -0,0 +1,343 @@
+"""
+test_dec_cache.py
+"""
+
+import pytest
+import pickle
+import sqlite3
+from sys import getsizeof
+from time import sleep
+from threading import Thread, Event
+import asyncio
+import pandas as pd
+from json import dumps
+from sigma7 import CACHE
+import sigma7.dec_cache as dc
+from sigma7.utils import deep_getsizeof, freeze
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    dc.flush_cache()
+    yield
+    dc.flush_cache()
+
+def test_deep_size():
+    nested = {"a": [list(range(100)) for _ in range(10)]}
+    assert deep_getsizeof(nested) > 10 * getsizeof(list(range(100)))
+
+def test_size_accounting():
+    dc.append_cache("iex", "MSFT", "f", {"x": list(range(50))})
+    dc.append_cache("iex", "AAPL", "f", {"x": list(range(50))})
+    total = sum(meta["size"] for meta in CACHE["entries"].values())
+    assert CACHE["size"] == total
+    dc.pop_cache("iex", "MSFT", "f")
+    dc.pop_cache("iex", "AAPL", "f")
+    assert CACHE["size"] == 0
+    assert not dc.pop_cache("iex", "AAPL", "f")
+
+def test_lru_eviction(monkeypatch):
+    entry = {"x": list(range(50))}
+    _size = deep_getsizeof(freeze(entry))
+    monkeypatch.setattr(dc, "cache_limit", _size * 2)
+    dc.append_cache("iex", "A", "f", dict(entry))
+    dc.append_cache("iex", "B", "f", dict(entry))
+    assert dc.check_cache("iex", "A", "f")
+    dc.append_cache("iex", "C", "f", dict(entry))
+    assert not dc.check_cache("iex", "B", "f")
+    assert dc.check_cache("iex", "A", "f")
+    assert dc.check_cache("iex", "C", "f")
+    assert CACHE["size"] <= dc.cache_limit
+
+def test_decorator_caches():
+    calls = []
+
+    @dc.cache(platform = "iex")
+    def func(symbol: str, frame: str = "1y") -> dict:
+        calls.append(symbol)
+        return {"symbol": symbol}
+
+    func(symbol = "MSFT")
+    func(symbol = "MSFT")
+    assert calls == ["MSFT"]
+
+def test_falsy_and_frame_hits():
+    calls = []
+
+    @dc.cache(platform = "iex")
+    def func(symbol: str, df: bool = False):
+        calls.append(symbol)
+        return pd.DataFrame({"x": [1, 2]}) if df else {}
+
+    assert func("MSFT") == {} and func("MSFT") == {}
+    assert func("MSFT", df = True).equals(func("MSFT", df = True))
+    assert calls == ["MSFT", "MSFT"]
+
+def test_purge_expired(monkeypatch):
+    dc.append_cache("iex", "MSFT", "f", {"x": 1})
+    monkeypatch.setattr(dc, "cache_time_limit", -1)
+    dc.append_cache("iex", "AAPL", "f", {"x": 1})
+    dc.purge_cache()
+    assert dc.check_cache("iex", "MSFT", "f")
+    assert not dc.check_cache("iex", "AAPL", "f")
+    dc.clean_cache()
+    assert "AAPL" not in CACHE["iex"]
+
+def test_sweeper(monkeypatch):
+    monkeypatch.setattr(dc, "cache_time_limit", -1)
+    dc.append_cache("iex", "MSFT", "f", {"x": 1})
+    assert dc.start_sweeper(interval = .01)
+    assert not dc.start_sweeper(interval = .01)
+    for _ in range(100):
+        if "MSFT" not in CACHE["iex"]: break
+        sleep(.01)
+    assert dc.stop_sweeper()
+    assert "MSFT" not in CACHE["iex"]
+
+def test_positional_keys():
+    calls = []
+
+    @dc.cache(platform = "iex")
+    def func(symbol: str, frame: str = "ytd", correlates: dict = None) -> dict:
+        calls.append(symbol)
+        return {"symbol": symbol}
+
+    func("MSFT")
+    func("MSFT", "ytd")
+    func(symbol = "MSFT", frame = "ytd")
+    func("MSFT", correlates = None)
+    assert calls == ["MSFT"]
+    func("MSFT", correlates = {"markets": {"a": 1}, "econ": {}})
+    func("MSFT", correlates = {"econ": {}, "markets": {"a": 1}})
+    func("MSFT", correlates = {"markets": {"a": 2}, "econ": {}})
+    assert calls == ["MSFT"] * 3
+
+def test_single_flight():
+    calls, release = [], Event()
+
+    @dc.cache(platform = "iex")
+    def func(symbol: str) -> dict:
+        calls.append(symbol)
+        release.wait(1)
+        return {"symbol": symbol}
+
+    out = []
+    threads = [Thread(target=lambda: out.append(func("MSFT"))) for _ in range(8)]
+    for thread in threads: thread.start()
+    sleep(.05)
+    release.set()
+    for thread in threads: thread.join()
+    assert calls == ["MSFT"]
+    assert len(out) == 8 and all(o["symbol"] == "MSFT" for o in out)
+
+def test_single_flight_async():
+    calls = []
+
+    @dc.cache(platform = "iex")
+    async def func(symbol: str) -> dict:
+        calls.append(symbol)
+        await asyncio.sleep(.01)
+        return {"symbol": symbol}
+
+    async def run():
+        return await asyncio.gather(*[func("MSFT") for _ in range(8)])
+
+    out = asyncio.run(run())
+    assert calls == ["MSFT"]
+    assert all(o["symbol"] == "MSFT" for o in out)
+
+def test_stale_while_revalidate():
+    calls = []
+
+    @dc.cache(platform = "iex", stale_after = 0)
+    def func(symbol: str) -> dict:
+        calls.append(symbol)
+        return {"symbol": symbol, "n": len(calls)}
+
+    assert func("MSFT")["n"] == 1
+    assert func("MSFT")["n"] == 1
+    for _ in range(100):
+        if len(calls) == 2 and not dc.INFLIGHT: break
+        sleep(.01)
+    assert func("MSFT")["n"] == 2
+
+def test_expired_entries_miss(monkeypatch):
+    monkeypatch.setattr(dc, "cache_time_limit", -1)
+    dc.append_cache("iex", "MSFT", "f", {"x": 1})
+    assert not dc.check_cache("iex", "MSFT", "f")
+    assert CACHE["size"] == 0
+
+def test_ttl_policies():
+    ts = pd.Timestamp("2021-06-04 17:00", tz = "America/New_York").timestamp()
+    close = pd.Timestamp(dc.entry_expiry(ts, dc.market_close()), unit = "s", tz = "UTC")
+    assert close == pd.Timestamp("2021-06-07 16:00", tz = "America/New_York")
+    nine = pd.Timestamp(dc.entry_expiry(ts, dc.expires_at(9)), unit = "s", tz = "UTC")
+    assert nine == pd.Timestamp("2021-06-05 09:00", tz = "America/New_York")
+    assert dc.entry_expiry(ts, 60) == ts + 60
+    dc.append_cache("iex", "MSFT", "f", {"x": 1}, ttl = 3600)
+    meta = CACHE["entries"][("iex", "MSFT", "f")]
+    assert meta["expires"] == meta["ts"] + 3600
+
+def test_stats(monkeypatch):
+    dc.reset_stats()
+
+    @dc.cache(platform = "iex")
+    def func(symbol: str) -> dict:
+        return {"symbol": symbol}
+
+    func("MSFT")
+    func("MSFT")
+    func("AAPL")
+    stats = dc.cache_stats()
+    stat = stats["functions"]["iex.func"]
+    assert (stat["hits"], stat["misses"], stat["entries"]) == (1, 2, 2)
+    assert sum(stat["latency"]) == 2
+    assert stat["bytes"] == stats["platforms"]["iex"]["bytes"] == CACHE["size"]
+    monkeypatch.setattr(dc, "cache_limit", stat["bytes"] // 2 + 1)
+    dc.evict_cache()
+    assert dc.cache_stats()["functions"]["iex.func"]["evictions"] == 1
+
+def test_frozen_values():
+    @dc.cache(platform = "iex")
+    def func(symbol: str) -> dict:
+        return {"symbol": symbol, "peers": ["AAPL"], "meta": {"n": 1}}
+
+    out = func("MSFT")
+    assert out is func("MSFT")
+    assert "cache_ts" not in out
+    with pytest.raises(TypeError):
+        out["symbol"] = "AAPL"
+    with pytest.raises(TypeError):
+        out["meta"]["n"] = 2
+    assert out["peers"] == ("AAPL",)
+    assert dumps(out) == dumps({"symbol": "MSFT", "peers": ["AAPL"], "meta": {"n": 1}})
+    _out = out.copy()
+    _out["symbol"] = "AAPL"
+    assert out["symbol"] == "MSFT"
+
+def test_encoded_entries(monkeypatch):
+    trades = [{"ticker": "MSFT", "amount": "$1,001 - $15,000", "type": "purchase", "n": i} for i in range(2000)]
+    trades.append({"ticker": "AAPL", "n": -1})
+    payload = {"transactions": trades, "df": pd.DataFrame({"a": range(100)})}
+    raw_size = deep_getsizeof(dc.freeze(payload))
+    monkeypatch.setattr(dc, "cache_encode_threshold", 1024)
+    dc.append_cache("sigma7", "misc", "f", payload)
+    meta = CACHE["entries"][("sigma7", "misc", "f")]
+    assert meta["encoded"] and meta["size"] * 5 < raw_size
+    out = dc.check_cache("sigma7", "misc", "f")
+    assert out["transactions"][5] == trades[5]
+    assert out["transactions"][-1] == {"ticker": "AAPL", "n": -1}
+    assert out["df"].equals(payload["df"])
+    with pytest.raises(TypeError):
+        out["transactions"][0]["n"] = 1
+
+def test_disk_tier(tmp_path, monkeypatch):
+    tier = dc.DiskCache(str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(dc, "TIERS", [tier])
+    dc.append_cache("iex", "MSFT", "f", {"symbol": "MSFT", "peers": ["AAPL"]}, ttl = 3600)
+    dc.flush_cache(tiers = False)
+    restarted = dc.DiskCache(str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(dc, "TIERS", [restarted])
+    out, meta = dc.lookup_cache("iex", "MSFT", "f")
+    assert out == {"symbol": "MSFT", "peers": ("AAPL",)}
+    assert meta["expires"] == meta["ts"] + 3600
+    assert ("iex", "MSFT", "f") in CACHE["entries"]
+    dc.append_cache("iex", "AAPL", "f", {"x": 1}, ttl = -1)
+    dc.flush_cache(tiers = False)
+    assert not dc.check_cache("iex", "AAPL", "f")
+    dc.flush_cache()
+    assert restarted.get("iex", "MSFT", "f") == (None, None)
+
+def test_pop_deletes_from_tiers(tmp_path, monkeypatch):
+    server = dc.LocalRedis()
+    monkeypatch.setattr(dc, "TIERS", [dc.DiskCache(str(tmp_path / "cache.sqlite")), dc.RedisCache(server, secret = "test")])
+    dc.append_cache("iex", "MSFT", "f", {"x": 1})
+    assert dc.pop_cache("iex", "MSFT", "f")
+    assert dc.lookup_cache("iex", "MSFT", "f") == (False, None)
+    assert not list(server.scan_iter())
+
+def test_unreadable_tier_entries(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite")
+    old = sqlite3.connect(path)
+    old.execute("CREATE TABLE entries (platform TEXT, key TEXT, func TEXT, name TEXT, ts REAL, expires REAL, compression TEXT, data BLOB, PRIMARY KEY (platform, key, func))")
+    old.execute("INSERT INTO entries VALUES ('iex', 'AAPL', 'f', 'f', 0, ?, 'none', ?)", (dc.time() + 3600, pickle.dumps({"x": 1})))
+    old.commit()
+    old.close()
+    tier = dc.DiskCache(path)
+    monkeypatch.setattr(dc, "TIERS", [tier])
+    dc.append_cache("iex", "MSFT", "f", {"x": 1})
+    dc.flush_cache(tiers = False)
+    tier.conn.execute("UPDATE entries SET data = ? WHERE key = 'MSFT'", (b"truncated",))
+    assert dc.lookup_cache("iex", "MSFT", "f") == (False, None)
+    assert dc.lookup_cache("iex", "AAPL", "f") == (False, None)
+    assert tier.get("iex", "MSFT", "f") == tier.get("iex", "AAPL", "f") == (None, None)
+    dc.append_cache("iex", "MSFT", "f", {"x": 2})
+    dc.flush_cache(tiers = False)
+    assert dc.check_cache("iex", "MSFT", "f") == {"x": 2}
+
+def test_shared_tier(monkeypatch):
+    server = dc.LocalRedis()
+    monkeypatch.setattr(dc, "TIERS", [dc.RedisCache(server, secret = "test")])
+    dc.append_cache("iex", "MSFT", "f", {"symbol": "MSFT"})
+    dc.flush_cache(tiers = False)
+    monkeypatch.setattr(dc, "TIERS", [dc.RedisCache(server, secret = "test")])
+    assert dc.check_cache("iex", "MSFT", "f") == {"symbol": "MSFT"}
+    dc.flush_cache()
+    assert not list(server.scan_iter())
+
+class Exploit:
+    ran = []
+    def __reduce__(self):
+        return (Exploit.ran.append, ("ran",))
+
+def test_shared_tier_rejects_unsigned(monkeypatch):
+    server = dc.LocalRedis()
+    monkeypatch.setattr(dc, "TIERS", [dc.RedisCache(server, secret = "other")])
+    dc.append_cache("iex", "MSFT", "f", {"symbol": "MSFT"})
+    header = dumps({"ts": dc.time(), "expires": dc.time() + 60, "name": "f", "compression": "none", "version": 1}).encode()
+    server.set("sigma7:iex:AAPL:f", header + b"\n" + pickle.dumps(Exploit()))
+    dc.flush_cache(tiers = False)
+    monkeypatch.setattr(dc, "TIERS", [dc.RedisCache(server, secret = "test")])
+    assert dc.lookup_cache("iex", "MSFT", "f") == (False, None)
+    assert dc.lookup_cache("iex", "AAPL", "f") == (False, None)
+    assert not Exploit.ran
+    with pytest.raises(ValueError):
+        dc.RedisCache(server, secret = "")
+
+def test_concurrent_mutation(monkeypatch):
+    monkeypatch.setattr(dc, "cache_limit", 20000)
+    errors = []
+
+    def work(n):
+        try:
+            for i in range(300):
+                symbol = f"S{(n * 7 + i) % 25}"
+                dc.append_cache("iex", symbol, "f", {"n": list(range(i % 30))}, ttl = (i % 3) - 1)
+                dc.check_cache("iex", symbol, "f")
+                if i % 10 == 0: dc.sweep_cache()
+                if i % 7 == 0: dc.pop_cache("iex", symbol, "f")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [Thread(target=work, args=(n,)) for n in range(8)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert not errors
+    assert CACHE["size"] == sum(meta["size"] for meta in CACHE["entries"].values())
+    assert CACHE["size"] <= dc.cache_limit
+    held = {(platform, key, func) for platform in ["iex"] for key, funcs in CACHE["iex"].items() for func in funcs}
+    assert held == set(CACHE["entries"].keys())
+
+def test_lookup_matches_meta_and_data(monkeypatch):
+    monkeypatch.setattr(dc, "cache_encode_threshold", 1024)
+    dc.append_cache("iex", "MSFT", "f", {"n": 1})
+    stripe, replaced = dc._stripe, []
+
+    def _stripe(platform, key):
+        # another thread replaces the entry with an encoded one as the lookup starts
+        if not replaced:
+            replaced.append(True)
+            dc.append_cache("iex", "MSFT", "f", {"n": list(range(500))})
+        return stripe(platform, key)
+
+    monkeypatch.setattr(dc, "_stripe", _stripe)
+    assert dc.check_cache("iex", "MSFT", "f")["n"] == tuple(range(500))
@@ -0,0 +1,175 @@
+"""
+test_political.py
+"""
+
+from datetime import date, timedelta
+from json import dumps
+from threading import Event
+from time import sleep
+import pytest
+import sigma7.political as political
+import sigma7.providers as providers
+import sigma7.sigma7 as s7
+import sigma7.dec_cache as dc
+
+def days_ago(n: int, us: bool = True) -> str:
+    day = date.today() - timedelta(n)
+    return day.strftime("%m/%d/%Y") if us else str(day)
+
+HOUSE = [
+    {"disclosure_date": days_ago(10), "ticker": "MSFT", "type": "purchase", "amount": "$1,001 - $15,000", "representative": "Hon. A", "district": "CA12", "disclosure_year": 2024, "cap_gains_over_200_usd": False},
+    {"disclosure_date": days_ago(40), "ticker": "MSFT", "type": "sale_full", "amount": "$15,001 - $50,000", "representative": "Hon. B", "district": "TX02"},
+    {"disclosure_date": days_ago(400), "ticker": "MSFT", "type": "purchase", "amount": "$1,001 - $15,000", "representative": "Hon. A", "district": "CA12"},
+    {"disclosure_date": "not a date", "ticker": "AAPL", "type": "purchase", "amount": "$1,001 - $15,000", "representative": "Hon. C", "district": "NY10"}
+]
+SENATE = [
+    {"disclosure_date": days_ago(5), "ticker": "MSFT", "type": "Sale (Partial)", "amount": "$50,001 - $100,000", "senator": "Sen. D", "comment": "--"},
+    {"disclosure_date": days_ago(20), "ticker": "AAPL", "type": "Purchase", "amount": "$1,001 - $15,000", "senator": "Sen. D"}
+]
+
+class FeedProvider:
+    def __init__(self, chunk: int = 7):
+        self.chunk = chunk
+        self.calls = []
+        self.house = list(HOUSE)
+
+    def stream_if_changed(self, path: str, validators: dict = None, **params):
+        self.calls.append(path)
+        feed = SENATE if "senate" in path else self.house
+        raw = dumps(feed, indent=1).encode()
+        etag = str(hash(raw))
+        if validators and validators["etag"] == etag: return None, validators
+        return (raw[i:i + self.chunk] for i in range(0, len(raw), self.chunk)), {"etag": etag}
+
+@pytest.fixture
+def feeds():
+    provider = FeedProvider()
+    providers.set_provider(provider)
+    dc.flush_cache()
+    yield provider
+    providers.set_provider(None)
+    dc.flush_cache()
+
+def test_iter_json_array():
+    raw = '[ {"a": "x,]"}, {"b": [1, 2]} ,{"c": "é"}]'.encode()
+    items = list(political.iter_json_array(raw[i:i + 3] for i in range(0, len(raw), 3)))
+    assert items == [{"a": "x,]"}, {"b": [1, 2]}, {"c": "é"}]
+    with pytest.raises(ValueError):
+        list(political.iter_json_array([b'[{"a": 1}, ']))
+
+def test_table_merges_chambers(feeds):
+    table = political.trade_table()
+    assert len(table) == 5
+    assert table.columns["timestamp"].tolist() == sorted(table.columns["timestamp"], reverse=True)
+    senate = table.row(0)
+    assert senate["chamber"] == "senate"
+    assert senate["type"] == "sale_partial"
+    assert senate["representative"] == "Sen. D"
+    assert senate["date"] == days_ago(5, us=False)
+    assert senate["disclosure_date"] == days_ago(5)
+    assert senate["senator"] == "Sen. D" and senate["comment"] == "--"
+    house = table.row(1)
+    assert house["disclosure_year"] == 2024 and house["cap_gains_over_200_usd"] is False
+    assert "comment" not in house and "senator" not in house
+    assert political.trade_table() is table
+    assert len(feeds.calls) == 2
+    split = s7.pull_political_trades(merge = False)["transactions"]
+    assert len(split["senate"]) == 2 and len(split["house"]) == 3
+
+def test_search_and_aggregates(feeds):
+    trades = s7.search_political_trades("MSFT", 6)["transactions"]
+    assert [trade["representative"] for trade in trades] == ["Sen. D", "Hon. A", "Hon. B"]
+    pie = s7.political_pie("MSFT")["data"]
+    assert pie["bought"]["est_volume"] == 8000
+    assert pie["sold"]["est_volume"] == 75000 + 32500
+    top = s7.top_political_traders("MSFT")["transactions"]
+    assert top[0]["name"] == "Sen. D"
+
+def settle():
+    for _ in range(200):
+        if not dc.INFLIGHT: return
+        sleep(.01)
+
+def test_refresh_merges_new_trades(feeds, monkeypatch):
+    table = political.trade_table()
+    monkeypatch.setattr(political, "political_trades_ttl", 0)
+    normalized = []
+    normalize_trade = political.normalize_trade
+    monkeypatch.setattr(political, "normalize_trade", lambda raw, chamber: normalized.append(raw) or normalize_trade(raw, chamber))
+    assert political.trade_table() is table
+    settle()
+    assert len(feeds.calls) == 4 and not normalized
+    feeds.house.append({"disclosure_date": days_ago(1), "ticker": "MSFT", "type": "purchase", "amount": "$1,001 - $15,000", "representative": "Hon. E", "district": "WA07"})
+    assert political.trade_table() is table
+    settle()
+    merged = political.trade_table()
+    settle()
+    assert merged is not table and len(table) == 5
+    assert len(merged) == 6 and merged.row(0)["representative"] == "Hon. E"
+    assert normalized == [feeds.house[-1]]
+
+def test_repeated_and_corrected_trades(feeds, monkeypatch):
+    feeds.house.append(dict(HOUSE[1]))
+    table = political.trade_table()
+    assert len(table) == 6
+    assert [table.row(i)["representative"] for i in table.query("MSFT")].count("Hon. B") == 2
+    monkeypatch.setattr(political, "political_trades_ttl", 0)
+    feeds.house[0] = dict(HOUSE[0], representative = "Hon. F")
+    feeds.house.pop()
+    political.trade_table()
+    settle()
+    fixed = political.trade_table()
+    names = [fixed.row(i)["representative"] for i in fixed.query("MSFT")]
+    assert len(fixed) == 5 and names.count("Hon. B") == 1
+    assert "Hon. F" in names and names.count("Hon. A") == 1
+
+def test_refresh_does_not_block(feeds, monkeypatch):
+    table = political.trade_table()
+    monkeypatch.setattr(political, "political_trades_ttl", 0)
+    gate = Event()
+    def stream_if_changed(path: str, validators: dict = None, **params):
+        gate.wait(5)
+        raise providers.PyEXception("Response 503 - ")
+    monkeypatch.setattr(feeds, "stream_if_changed", stream_if_changed)
+    assert political.trade_table() is table
+    assert political.trade_table() is table
+    gate.set()
+    settle()
+    assert political.trade_table() is table
+    settle()
+
+def test_ticker_index(feeds):
+    table = political.trade_table()
+    rows = table.query("MSFT")
+    assert [table.columns["representative"][i] for i in rows] == ["Sen. D", "Hon. A", "Hon. B", "Hon. A"]
+    ts = [table.columns["timestamp"][i] for i in rows]
+    assert table.query("MSFT", start = ts[2]).tolist() == rows[:3].tolist()
+    assert table.query("MSFT", start = ts[2], end = ts[1]).tolist() == rows[1:3].tolist()
+    assert table.query("MSFT", end = ts[0] - 1).tolist() == rows[1:].tolist()
+    assert len(table.query("TSLA")) == 0
+
+def test_columnar_table(feeds):
+    table = political.trade_table()
+    assert table.columns["timestamp"].dtype == "int64"
+    assert table.columns["ticker"].dtype == "category"
+    assert table.take("amount_mid").tolist() == [75000, 8000, 8000, 32500, 8000]
+    history = s7.politician_transactions("MSFT", rollingN = 2)["transactions"]
+    assert len(history) == 1
+    assert (history[0]["date"], history[0]["purchase_volume"], history[0]["rolling_sale_vol"], history[0]["rolling_total_vol"]) == (days_ago(400, us=False), 8000, 16250, 20250)
+    top = s7.top_political_traders("MSFT")["transactions"]
+    assert [(trader["name"], trader["est_sale_volume"], trader["est_purchase_volume"]) for trader in top] == [("Sen. D", 75000, 0), ("Hon. B", 32500, 0), ("Hon. A", 0, 16000)]
+    assert top[1]["state"] == "TX" and top[0]["district"] is False
+
+def test_table_cached_in_tiers(feeds, tmp_path, monkeypatch):
+    monkeypatch.setattr(dc, "TIERS", [dc.DiskCache(str(tmp_path / "cache.sqlite"))])
+    monkeypatch.setattr(dc, "cache_encode_threshold", 1)
+    table = political.trade_table()
+    assert political.trade_table() is table
+    value, meta = dc.lookup_cache(*political.TRADES)
+    assert value["table"] is table and not meta["encoded"]
+    assert meta["size"] == dc.deep_getsizeof(value) == dc.CACHE["size"]
+    dc.flush_cache(tiers = False)
+    cold = political.trade_table()
+    assert len(feeds.calls) == 2
+    assert cold.rows() == table.rows()
+    assert political.trade_table() is cold
@@ -0,0 +1,76 @@
+"""
+test_price_store.py
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+import sigma7.price_store as ps
+import sigma7.providers as providers
+import sigma7.dec_cache as dc
+
+def fake_chart(frame: str) -> pd.DataFrame:
+    end = pd.Timestamp.today().normalize()
+    dates = pd.bdate_range(ps.frame_start(frame, end) + pd.Timedelta(days=1), end)
+    close = np.linspace(100, 200, len(dates))
+    return pd.DataFrame({"close": close, "uClose": close, "changePercent": .01, "label": "x"}, index=pd.Index(dates, name="date"))
+
+def records(prices: pd.DataFrame) -> list:
+    return prices.reset_index().assign(date=lambda df: df["date"].dt.strftime("%Y-%m-%d")).to_dict("records")
+
+class ChartProvider:
+    def __init__(self):
+        self.calls = []
+        self.bars = None
+
+    def get(self, path: str, **params):
+        frame = path.split("/")[-1]
+        self.calls.append(frame)
+        return records(self.bars if self.bars is not None else fake_chart(frame))
+
+@pytest.fixture
+def fetches():
+    provider = ChartProvider()
+    providers.set_provider(provider)
+    dc.flush_cache()
+    yield provider.calls
+    providers.set_provider(None)
+    dc.flush_cache()
+
+def test_frames_sliced_from_one_fetch(fetches):
+    ytd = ps.price_history("MSFT", "ytd")
+    assert fetches == ["1y"]
+    assert ytd.index.min() >= pd.Timestamp(pd.Timestamp.today().year, 1, 1)
+    assert list(ytd.columns) == ["close", "uClose", "changePercent"]
+    assert (ytd.dtypes == "float64").all()
+    ps.price_history("MSFT", "1y")
+    ps.price_history("MSFT", "3m")
+    assert fetches == ["1y"]
+
+def test_longer_frame_replaces_history(fetches):
+    ps.price_history("MSFT", "1y")
+    five = ps.price_history("MSFT", "5y")
+    two = ps.price_history("MSFT", "2y")
+    assert fetches == ["1y", "5y"]
+    assert len(two) < len(five)
+    assert two.index.is_monotonic_increasing
+    with pytest.raises(ValueError):
+        two["close"].to_numpy()[0] = 0
+
+def test_stale_history_topped_up(fetches, monkeypatch):
+    full = fake_chart("1y")
+    new_day = full.index[-1]
+    ps.store_history("MSFT", "1y", full.iloc[:-1], asof=new_day - pd.Timedelta(days=1))
+    later = ps.time() + 86400 * 4
+    monkeypatch.setattr(ps, "time", lambda: later)
+    bars = full.iloc[-3:].copy()
+    bars["changePercent"] = 0
+    providers.get_provider().bars = bars
+    out = ps.price_history("MSFT", "1y")
+    assert fetches == ["5d"]
+    assert out.index[-1] == new_day
+    assert out.index.is_unique
+    expected = (full["close"].iloc[-1] / full["close"].iloc[-2] - 1) * 100
+    assert out["changePercent"].iloc[-1] == pytest.approx(expected, abs=1e-4)
+    ps.price_history("MSFT", "ytd")
+    assert fetches == ["5d"]
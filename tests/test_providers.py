@@ -0,0 +1,70 @@
+"""
+test_providers.py
+"""
+
+import asyncio
+import pytest
+import pandas as pd
+import sigma7.providers as providers
+import sigma7.iex_funcs as iex
+import sigma7.aio_iex as aio
+import sigma7.dec_cache as dc
+from sigma7.wrapper import wrap
+
+DAYS = pd.bdate_range(end = pd.Timestamp.today().normalize() - pd.Timedelta(days=1), periods = 4).strftime("%Y-%m-%d")
+CHART = [{"date": day, "close": 100.0 + i, "uClose": 100.0 + i, "changePercent": 1.0} for i, day in enumerate(DAYS)]
+DIVS = [{"exDate": DAYS[1], "amount": 1.5}]
+COMPANY = {"companyName": "Microsoft Corporation", "securityName": "Microsoft Corp", "CEO": "Satya Nadella"}
+
+class FakeProvider:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, path: str, **params):
+        self.calls.append(path)
+        if path == "stock/market/batch":
+            data = {"chart": CHART, "dividends": DIVS}
+            return {symbol: {_type: data[_type] for _type in params["types"].split(",")} for symbol in params["symbols"].split(",")}
+        if path.endswith("/company"): return COMPANY
+        if "/chart/" in path: return CHART
+        if "/dividends/" in path: return DIVS
+        raise providers.PyEXception("Response 404 - ")
+
+    async def get_async(self, path: str, **params):
+        return self.get(path, **params)
+
+@pytest.fixture
+def fixtures(tmp_path):
+    dc.flush_cache()
+    yield str(tmp_path)
+    providers.set_provider(None)
+    dc.flush_cache()
+
+def test_record_then_replay(fixtures):
+    fake = FakeProvider()
+    providers.set_provider(providers.RecordingProvider(fixtures, fake))
+    live = iex.full_returns("MSFT", "1m")
+    assert asyncio.run(aio.full_returns_async("MSFT", "1m")) is live
+    assert dc.lookup_cache(*aio.batch_entry("MSFT", "dividends", "1m"))[1] is not None
+    assert iex.search_terms("MSFT")[0] == "MSFT"
+    dc.flush_cache()
+    providers.set_provider(providers.ReplayProvider(fixtures))
+    assert iex.full_returns("MSFT", "1m") == live
+    assert live["return"] == round(103.0 - 100.0 + 1.5, 2)
+    assert asyncio.run(providers.fetch_async("stock/MSFT/company", token = "secret")) == COMPANY
+    with pytest.raises(providers.PyEXception):
+        providers.fetch("stock/AAPL/company")
+
+def test_make_provider(fixtures):
+    assert isinstance(providers.make_provider("iex"), providers.IEXProvider)
+    assert isinstance(providers.make_provider("replay", fixtures), providers.ReplayProvider)
+    with pytest.raises(ValueError):
+        providers.make_provider("replay")
+
+def test_routes_replay(fixtures):
+    fake = FakeProvider()
+    providers.set_provider(providers.RecordingProvider(fixtures, fake))
+    assert wrap("iex", "prices", {"symbol": "MSFT", "timeframe": "1y"}) == CHART
+    providers.set_provider(providers.ReplayProvider(fixtures))
+    assert wrap("iex", "prices", {"symbol": "MSFT", "timeframe": "1y"}) == CHART
+    assert fake.calls == ["stock/MSFT/chart/1y"]
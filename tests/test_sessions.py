@@ -0,0 +1,59 @@
+"""
+test_sessions.py
+"""
+
+import pytest
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pyEX.common.urls as urls
+import sigma7.sessions as sessions
+import sigma7.throttle as throttle
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(throttle, "upstream_backoff", 0)
+    state = {"ports": set(), "fail": 0, "hits": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            state["hits"] += 1
+            state["ports"].add(self.client_address[1])
+            status = 503 if state["fail"] > 0 else 200
+            state["fail"] -= 1
+            body = b'{"ok": true}'
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    sessions.close_session()
+    yield state, f"http://127.0.0.1:{httpd.server_address[1]}/"
+    sessions.close_session()
+    httpd.shutdown()
+
+def test_connection_reused(server):
+    state, url = server
+    for _ in range(5):
+        assert sessions.get(url).json() == {"ok": True}
+    assert state["hits"] == 5
+    assert len(state["ports"]) == 1
+
+def test_retries_with_backoff(server):
+    state, url = server
+    state["fail"] = 2
+    assert sessions.get(url).status_code == 200
+    assert state["hits"] == 3
+
+def test_pyex_uses_session(server):
+    state, url = server
+    assert isinstance(urls.requests, sessions.PooledRequests)
+    urls.requests.get(url)
+    urls.requests.get(url)
+    assert len(state["ports"]) == 1
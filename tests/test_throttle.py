@@ -0,0 +1,58 @@
+"""
+test_throttle.py
+"""
+
+import asyncio
+from types import SimpleNamespace
+import pytest
+import sigma7.throttle as throttle
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(throttle, "sleep", sleeps.append)
+    throttle.BUCKETS.clear()
+    yield sleeps
+    throttle.BUCKETS.clear()
+
+def test_bucket_limits_rate():
+    bucket = throttle.TokenBucket(rate = 10, burst = 2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(.1, abs=.01)
+
+def test_background_keeps_reserve():
+    bucket = throttle.TokenBucket(rate = 10, burst = 4)
+    assert bucket.take("background") == 0
+    assert bucket.take("background") == 0
+    assert bucket.take("background") > 0
+    assert bucket.take("user") == 0
+    assert bucket.take("user") == 0
+
+class Response(SimpleNamespace):
+    def close(self):
+        self.closed = True
+
+def test_call_retries_with_backoff(no_sleep):
+    statuses, sent = [429, 503, 200], []
+    send = lambda: sent.append(Response(status_code=statuses.pop(0), headers={"Retry-After": "2"}, closed=False)) or sent[-1]
+    assert throttle.call("test", send).status_code == 200
+    assert no_sleep == [2.0, 2.0]
+    assert [resp.closed for resp in sent] == [True, True, False]
+    statuses = [503] * (throttle.upstream_retries + 1)
+    assert throttle.call("test", send).status_code == 503
+    assert not sent[-1].closed
+    assert throttle.call("test", lambda: Response(status_code=404, headers={})).status_code == 404
+
+def test_call_async_retries_connection_errors(monkeypatch):
+    monkeypatch.setattr(throttle, "upstream_backoff", 0)
+    attempts = []
+    async def send():
+        attempts.append(throttle.PRIORITY.get())
+        if len(attempts) < 3: raise ConnectionResetError()
+        return 200, {}, "ok"
+    async def main():
+        with throttle.background():
+            return await throttle.call_async("test", send)
+    assert asyncio.run(main()) == (200, {}, "ok")
+    assert attempts == ["background"] * 3